@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# bench_thumbnails.py
+# Compare thumbnail decode speed of the quality settings in thumbnails.py.
+#
+#   python bench_thumbnails.py                 # synthetic 20 MP JPEG and PNG
+#   python bench_thumbnails.py a.jpg b.png     # your own images
+import os
+import sys
+import time
+import tempfile
+from PIL import Image, ImageChops
+from thumbnails import DECODE_QUALITIES, load_thumbnail
+
+WIDTH = 350
+REPEAT = 5
+
+
+def make_samples(folder):
+    """20 MP noisy gradient, saved as JPEG and PNG."""
+    size = (5472, 3648)
+    img = Image.merge("RGB", (
+        Image.linear_gradient("L").resize(size),
+        Image.effect_noise(size, 40),
+        Image.radial_gradient("L").resize(size),
+    ))
+    paths = []
+    for ext, kwargs in ((".jpg", {"quality": 92}), (".png", {"compress_level": 1})):
+        path = os.path.join(folder, "bench" + ext)
+        img.save(path, **kwargs)
+        paths.append(path)
+    return paths
+
+
+def mean_abs_diff(a, b):
+    diff = ImageChops.difference(a.convert("RGB"), b.convert("RGB"))
+    hist = diff.convert("L").histogram()
+    return sum(i * n for i, n in enumerate(hist)) / max(1, sum(hist))
+
+
+def bench(path):
+    print(f"\n{os.path.basename(path)}  ({Image.open(path).size[0]}x{Image.open(path).size[1]})")
+    reference = load_thumbnail(path, WIDTH, "best")
+    baseline = None
+    for quality in DECODE_QUALITIES:
+        timings = []
+        for _ in range(REPEAT):
+            t = time.perf_counter()
+            img = load_thumbnail(path, WIDTH, quality)
+            timings.append(time.perf_counter() - t)
+        best = min(timings)
+        baseline = baseline or best
+        print(f"  {quality:<9} {best * 1000:8.1f} ms  x{baseline / best:5.1f}"
+              f"  mean abs diff vs best: {mean_abs_diff(reference, img):.2f}")
+
+
+def main():
+    paths = sys.argv[1:]
+    with tempfile.TemporaryDirectory() as tmp:
+        if not paths:
+            paths = make_samples(tmp)
+        for path in paths:
+            bench(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# check_cancel.py
+# Check that a cancelled folder load stops within CANCEL_TIMEOUT_MS, cancelled
+# while scanning and while decoding, in the GUI thread and with a process pool.
+# Exits non-zero on failure.
+#
+#   python check_cancel.py            # 2 samples x 400 images of 3000x2000
+#   python check_cancel.py 1000       # images per sample
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Empty thumbnail cache, or the load would finish from it before the cancel
+CACHE_DIR = tempfile.mkdtemp()
+os.environ["APPDATA"] = CACHE_DIR
+
+from PIL import Image
+from PyQt6.QtCore import QCoreApplication
+from image_store import ImageStore
+from main import CANCEL_TIMEOUT_MS, ImageLoaderThread
+from worker_pool import shutdown_pools
+
+IMAGES_PER_SAMPLE = 400
+TIMEOUT_S = 60
+
+
+def make_folder(folder, count):
+    """Copies of one large JPEG: each copy still has to be decoded."""
+    first = os.path.join(folder, "first.jpg")
+    Image.effect_noise((3000, 2000), 60).convert("RGB").save(first, quality=90)
+    for sample in ("ED_1", "ED_2"):
+        os.makedirs(os.path.join(folder, sample))
+        for i in range(count):
+            shutil.copyfile(first, os.path.join(folder, sample, f"img{i:05d}.jpg"))
+    os.remove(first)
+
+
+def wait_for(done, seconds):
+    app = QCoreApplication.instance()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        if done():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def check(folder, workers, while_decoding):
+    loader = ImageLoaderThread(folder, ImageStore(), workers=workers)
+    progress = []
+    cancelled = []
+    loader.progress_changed.connect(lambda done, total, tag: progress.append(done))
+    loader.loading_cancelled.connect(cancelled.append)
+    loader.start()
+    if while_decoding and not wait_for(lambda: progress, TIMEOUT_S):
+        print(f"workers {workers}: no tag decoded within {TIMEOUT_S} s")
+        loader.cancel()
+        loader.wait()
+        return False
+    loader.cancel()
+    stopped = wait_for(lambda: loader.isFinished(), TIMEOUT_S)
+    loader.wait()
+    wait_for(lambda: cancelled, 1)
+
+    phase = "decoding" if while_decoding else "scanning"
+    if not stopped or loader.cancel_latency is None:
+        print(f"{phase:<8} workers {workers}: load was not cancelled (finished: {stopped})")
+        return False
+    latency_ms = loader.cancel_latency * 1000
+    ok = latency_ms < CANCEL_TIMEOUT_MS and cancelled == [loader.cancel_latency]
+    print(f"{phase:<8} workers {workers}: stopped in {latency_ms:.0f} ms (bound {CANCEL_TIMEOUT_MS} ms), "
+          f"{len(progress)} tags decoded before, ok: {ok}")
+    return ok
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else IMAGES_PER_SAMPLE
+    app = QCoreApplication(sys.argv)  # noqa: F841, kept alive for the loader signals
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as folder:
+            make_folder(folder, count)
+            for workers in (1, 2):
+                for while_decoding in (False, True):
+                    results.append(check(folder, workers, while_decoding))
+    finally:
+        shutdown_pools()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
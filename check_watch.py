@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# check_watch.py
+# Check that watch mode notices an image rewritten in place (same file, directory untouched),
+# both with a watch on the file and when it is polled. Exits non-zero on failure.
+#
+#   python check_watch.py
+import os
+import sys
+import time
+import tempfile
+from PIL import Image
+from PyQt6.QtCore import QCoreApplication
+import folder_watch
+from folder_watch import FolderWatcher
+from scanner import FolderState, scan_folder
+
+TIMEOUT_S = 10
+
+
+def make_folder(folder):
+    for sample in ("ED_1", "ED_2"):
+        os.makedirs(os.path.join(folder, sample))
+        for i in range(3):
+            Image.new("RGB", (64, 48), (40 * i, 0, 0)).save(os.path.join(folder, sample, f"img{i}.png"))
+
+
+def rewrite_in_place(path, scratch):
+    """Write new pixels into the existing file: same inode, no rename, no new directory entry."""
+    tmp = os.path.join(scratch, "new.png")
+    Image.new("RGB", (64, 48), (0, 255, 0)).save(tmp)
+    with open(tmp, "rb") as f:
+        data = f.read()
+    with open(path, "r+b") as f:
+        f.write(data)
+        f.truncate()
+
+
+def wait_for(done, seconds):
+    app = QCoreApplication.instance()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        if done():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def check(polled):
+    folder_watch.MAX_FILE_WATCHES = 0 if polled else 4096
+    folder_watch.POLL_PASS_PAUSE_S = 0.2
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as scratch:
+        make_folder(tmp)
+        dirs = {}
+        samples, tag_map, _ = scan_folder(tmp, dirs=dirs)
+        state = FolderState(samples, dirs)
+        target = tag_map["img1.png"]["ED_2"]
+
+        watcher = FolderWatcher()
+        changed = []
+        watcher.dirs_changed.connect(changed.extend)
+        files = [os.path.join(path, name) for path, (_, names, _) in dirs.items() for name in names]
+        watcher.watch(list(dirs), files)
+        wait_for(lambda: False, 0.5)  # first poll pass records the files
+
+        rewrite_in_place(target, scratch)
+        noticed = wait_for(lambda: os.path.dirname(target) in changed, TIMEOUT_S)
+        added, _, _ = state.rescan(changed) if noticed else ([], [], [])
+        watcher.stop()
+
+    mode = "polled" if polled else "watched"
+    ok = noticed and ("img1.png", "ED_2", target) in added
+    print(f"{mode:<8} rewrite noticed: {noticed}, rescan reports it: {ok}")
+    return ok
+
+
+def main():
+    app = QCoreApplication(sys.argv)  # noqa: F841, kept alive for the watchers
+    results = [check(polled=False), check(polled=True)]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
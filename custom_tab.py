@@ -1,29 +1,244 @@
 # custom_tab.py
+# Custom Images tab: a virtualized grid of dropped files and folders, decoded in the background.
 import os
-from PyQt6.QtWidgets import QWidget, QGridLayout, QLabel, QVBoxLayout, QSizePolicy
-from PyQt6.QtCore import Qt, pyqtSignal, QEvent
-from PyQt6.QtGui import QPixmap, QDragEnterEvent, QDropEvent
-from PIL import Image
+import time
+import threading
+from collections import OrderedDict
+from PyQt6.QtWidgets import QAbstractScrollArea, QWidget, QLabel, QVBoxLayout, QSizePolicy
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QRunnable, QThread, QThreadPool
+from PyQt6.QtGui import QDragEnterEvent, QDragMoveEvent, QDropEvent
+from scanner import iter_image_files
+from qt_images import qimage_to_pixmap, thumbnail_to_qimage
+from thumbnails import DEFAULT_QUALITY, Thumbnail, fit_to_box
+from worker_pool import default_workers
 
-class CustomImageGrid(QWidget):
+DROP_BATCH = 32  # files added to the grid at once while a drop is listed
+DROP_GROWTH = 8  # later batches grow to 1/8 of the files so far, each batch relays out every cell
+DROP_FLUSH_S = 0.1  # a partial batch is added after this long
+MAX_PENDING = 256  # dropped files waiting for decoding before listing pauses
+DEFAULT_BUDGET_MB = 256  # decoded drops kept in memory, about 1200 images at 350 px
+
+# Geometry (px) of the grid, matching the old QGridLayout based one
+GRID_MARGIN = 10
+GRID_SPACING = 10
+CELL_PADDING = 5
+CELL_BORDER = 2
+NAME_HEIGHT = 24
+OVERSCAN = 1.0  # extra viewport heights kept alive above and below
+
+
+def load_fitted(path, box_width, box_height, quality=DEFAULT_QUALITY):
+    """Decode path once, fitted into the box, as a Thumbnail buffer (None on failure)."""
+    from PIL import Image
+    try:
+        with Image.open(path) as img:
+            return Thumbnail.from_pil(fit_to_box(img, box_width, box_height, quality))
+    except Exception as e:
+        print(f"Error loading {path}: {e}")
+        return None
+
+
+class _DecodeSignals(QObject):
+    done = pyqtSignal(int, int, object)  # generation, index, Thumbnail or None
+    skipped = pyqtSignal(int, int)  # generation, index of a reload no longer shown
+
+
+class _DecodeTask(QRunnable):
+    """Decodes one dropped file on the thread pool; the GUI thread only wraps the buffer."""
+
+    def __init__(self, signals, generation, index, path, box_width, box_height, wanted=None):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.index = index
+        self.path = path
+        self.box_width = box_width
+        self.box_height = box_height
+        self.wanted = wanted  # reloads: indexes on screen, checked before decoding
+
+    def run(self):
+        if self.wanted is not None and self.index not in self.wanted:
+            self.signals.skipped.emit(self.generation, self.index)
+            return
+        thumb = load_fitted(self.path, self.box_width, self.box_height)
+        self.signals.done.emit(self.generation, self.index, thumb)
+
+
+class _ThumbnailLRU:
+    """Decoded drops within a memory budget, least recently used dropped first (GUI thread only)."""
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._entries = OrderedDict()  # index -> Thumbnail
+        self._bytes = 0
+
+    def get(self, index):
+        thumb = self._entries.get(index)
+        if thumb is not None:
+            self._entries.move_to_end(index)
+        return thumb
+
+    def put(self, index, thumb):
+        old = self._entries.pop(index, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[index] = thumb
+        self._bytes += thumb.nbytes
+        while self._bytes > self.budget_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def memory_bytes(self):
+        return self._bytes
+
+
+class _Backlog:
+    """Dropped files handed to the grid but not decoded yet, shared with the listing threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._cond = threading.Condition()
+
+    def add(self, n):
+        with self._cond:
+            self.count += n
+
+    def done(self):
+        with self._cond:
+            self.count -= 1
+            if self.count == MAX_PENDING // 2:
+                self._cond.notify_all()
+
+    def wait(self, should_stop):
+        """Block while MAX_PENDING files are waiting, until half of them are decoded. False when stopped."""
+        with self._cond:
+            if self.count < MAX_PENDING:
+                return True
+            while self.count > MAX_PENDING // 2:
+                if should_stop():
+                    return False
+                self._cond.wait(0.1)
+        return True
+
+
+class _DropListThread(QThread):
+    """
+    Lists dropped files and folders (recursively) and hands the image files
+    to the grid in batches. Listing pauses while the grid has MAX_PENDING
+    files waiting for decoding, so a huge folder is never queued at once.
+    Batches start small for a quick first screen and then grow, since every
+    batch makes the grid lay out all its cells again.
+    """
+    batch_found = pyqtSignal(int, list)  # generation, file paths
+
+    def __init__(self, paths, generation, backlog):
+        super().__init__()
+        self.paths = paths
+        self.generation = generation
+        self.backlog = backlog
+
+    def run(self):
+        batch = []
+        emitted = 0
+        flushed = time.perf_counter()
+        for path in iter_image_files(self.paths, self.isInterruptionRequested):
+            batch.append(path)
+            if len(batch) >= max(DROP_BATCH, emitted // DROP_GROWTH) or time.perf_counter() - flushed >= DROP_FLUSH_S:
+                emitted += len(batch)
+                self._emit(batch)
+                batch = []
+                if not self.backlog.wait(self.isInterruptionRequested):
+                    return
+                flushed = time.perf_counter()
+        if batch and not self.isInterruptionRequested():
+            self._emit(batch)
+
+    def _emit(self, batch):
+        self.backlog.add(len(batch))
+        self.batch_found.emit(self.generation, batch)
+
+
+class _Cell(QWidget):
+    """Bordered image + file name, reused for another drop when scrolled away."""
+
+    def __init__(self, parent, img_width, box_height):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(CELL_PADDING, CELL_PADDING, CELL_PADDING, CELL_PADDING)
+        layout.setSpacing(CELL_PADDING)
+        layout.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
+        self.setStyleSheet("border: 2px solid #555; border-radius: 5px;")
+
+        self.img_label = QLabel()
+        self.img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.img_label.setFixedSize(img_width, box_height)
+        self.img_label.setStyleSheet("background-color: #222;")
+        layout.addWidget(self.img_label, alignment=Qt.AlignmentFlag.AlignHCenter)
+
+        self.sample_label = QLabel()
+        self.sample_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.sample_label.setFixedHeight(NAME_HEIGHT)
+        self.sample_label.setStyleSheet("color: white; font-size: 14px;")
+        layout.addWidget(self.sample_label, alignment=Qt.AlignmentFlag.AlignHCenter)
+
+    def bind(self, path, thumb, failed):
+        self.sample_label.setText(os.path.basename(path))
+        pixmap = qimage_to_pixmap(thumbnail_to_qimage(thumb))
+        if pixmap is not None:
+            self.img_label.setPixmap(pixmap)
+        else:
+            self.img_label.clear()
+            self.img_label.setText("No image" if failed else "Loading...")
+
+
+class CustomImageGrid(QAbstractScrollArea):
+    """
+    Grid of dropped images. Every drop is decoded once on the thread pool
+    (for the progress), but only the cells near the viewport exist as
+    widgets and decoded images are kept in a bounded LRU; cells scrolled
+    back to after eviction are decoded again in the background.
+    """
     images_dropped = pyqtSignal(list)  # emits list of file paths
+    progress_changed = pyqtSignal(int, int)  # decoded, total
 
-    def __init__(self, max_columns=4, img_width=350):
+    def __init__(self, max_columns=4, img_width=350, budget_mb=DEFAULT_BUDGET_MB):
         super().__init__()
 
         self.max_columns = max_columns
         self.img_width = img_width
+        self.box_height = int(img_width * 9 / 16)
         self.images = []
+        self.verticalScrollBar().setSingleStep(40)
+        self.horizontalScrollBar().setSingleStep(40)
 
-        self.layout = QGridLayout(self)
-        self.layout.setContentsMargins(10, 10, 10, 10)
-        self.layout.setSpacing(10)
+        # Dropped files are decoded on worker threads and fill in their placeholders;
+        # results of a previous generation (before clear_all) are dropped
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(default_workers())
+        self._signals = _DecodeSignals()
+        self._signals.done.connect(self._on_decoded)
+        self._signals.skipped.connect(self._on_skipped)
+        self._generation = 0
+        self._thumbs = _ThumbnailLRU(budget_mb)
+        self._failed = set()
+        self._first = set()  # indexes not decoded once yet
+        self._decoding = set()  # indexes queued on the pool
+        self._decoded = 0
+        self._backlog = _Backlog()
+        self._list_threads = []
+        self._bound = {}  # index -> _Cell
+        self._free = []
 
         self.setAcceptDrops(True)
+        self.viewport().setAcceptDrops(True)
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
 
         # Optional placeholder text
-        self.placeholder_label = QLabel("Drag images here")
+        self.placeholder_label = QLabel("Drag images here", self.viewport())
         self.placeholder_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.placeholder_label.setStyleSheet("""
             color: gray;
@@ -31,111 +246,200 @@ class CustomImageGrid(QWidget):
             border: 2px dashed #555;
             padding: 50px;
         """)
-        self.layout.addWidget(self.placeholder_label, 0, 0, 1, self.max_columns)
 
     def add_images(self, image_paths):
         """Add images to the grid."""
-        # Remove placeholder if present
-        if self.placeholder_label and self.placeholder_label.parent():
-            self.placeholder_label.setParent(None)
-            self.placeholder_label = None
-
+        self.placeholder_label.hide()
         start_index = len(self.images)
         self.images.extend(image_paths)
         self.update_grid(start_index)
 
     def update_grid(self, start_index=0):
-        """Rebuilds grid from start_index to end."""
-        col_count = self.max_columns
-
+        """Queues the decoding of the images from start_index on and shows the cells in view."""
         for idx in range(start_index, len(self.images)):
-            path = self.images[idx]
-            pixmap = self.load_pixmap(path)
-
-            # --- Container with border ---
-            container = QWidget()
-            container_layout = QVBoxLayout(container)
-            container_layout.setContentsMargins(5, 5, 5, 5)
-            container_layout.setSpacing(5)
-            container_layout.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
-            container.setStyleSheet("border: 2px solid #555; border-radius: 5px;")
-            container.setSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Minimum)
-
-            # --- Image label ---
-            img_label = QLabel()
-            img_label.setPixmap(pixmap)
-            img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            img_label.setFixedWidth(self.img_width)
-            img_label.setFixedHeight(int(self.img_width * 9 / 16))
-            img_label.setStyleSheet("background-color: #222;")
-            container_layout.addWidget(img_label, alignment=Qt.AlignmentFlag.AlignHCenter)
-
-            # --- Sample label (filename) ---
-            sample_label = QLabel(os.path.basename(path))
-            sample_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            sample_label.setStyleSheet("color: white; font-size: 14px;")
-            container_layout.addWidget(sample_label, alignment=Qt.AlignmentFlag.AlignHCenter)
-
-            row = idx // col_count
-            col = idx % col_count
-            self.layout.addWidget(container, row, col)
+            self._first.add(idx)
+            self._decode(idx)
+        self._update_scrollbars()
+        self._update_visible()
+        self.progress_changed.emit(self._decoded, len(self.images))
+
+    def _decode(self, index, wanted=None):
+        self._decoding.add(index)
+        task = _DecodeTask(self._signals, self._generation, index, self.images[index],
+                           self.img_width, self.box_height, wanted)
+        # Reloads of cells on screen go ahead of the drops still decoding
+        self.pool.start(task, 0 if wanted is None else 1)
+
+    def _on_decoded(self, generation, index, thumb):
+        if generation != self._generation:
+            return
+        self._decoding.discard(index)
+        if thumb is None:
+            self._failed.add(index)
+        else:
+            self._thumbs.put(index, thumb)
+        cell = self._bound.get(index)
+        if cell is not None:
+            cell.bind(self.images[index], thumb, thumb is None)
+        if index in self._first:
+            self._first.discard(index)
+            self._decoded += 1
+            self._backlog.done()
+            self.progress_changed.emit(self._decoded, len(self.images))
+
+    def _on_skipped(self, generation, index):
+        if generation != self._generation:
+            return
+        self._decoding.discard(index)
+        if index in self._bound:
+            # Scrolled away and back before the reload ran
+            self._decode(index, self._bound)
 
     def clear_all(self):
         """Removes all images and resets grid with subtle placeholder."""
-        # Clear internal storage
+        # Clear internal storage, queued decodes are dropped and running ones ignored
+        self._stop_listing()
+        self.pool.clear()
+        self._generation += 1
+        self._release_all()
+        self._thumbs.clear()
+        self._failed.clear()
+        self._first.clear()
+        self._decoding.clear()
+        self._decoded = 0
+        self._backlog = _Backlog()
         self.images.clear()
         self.images_dropped.emit([])  # emit empty list to notify parent
+        self._update_scrollbars()
 
-        # Remove all widgets from layout
-        while self.layout.count():
-            item = self.layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-
-        # Add subtle placeholder spanning full width
-        placeholder = QLabel("Drag images here")
-        placeholder.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        placeholder.setStyleSheet("""
+        # Subtle placeholder spanning full width
+        self.placeholder_label.setStyleSheet("""
             color: gray;
             font-size: 16px;
             border: 1px dashed #888;
             padding: 20px;
             background-color: #333;
         """)
-        self.layout.addWidget(placeholder, 0, 0, 1, self.max_columns)
-
-
-
-    def load_pixmap(self, path):
-        """Load image as QPixmap and scale to width while keeping aspect ratio."""
-        try:
-            img = Image.open(path)
-            img_ratio = img.width / img.height
-            target_height = int(self.img_width / img_ratio)
-            img = img.resize((self.img_width, target_height), Image.LANCZOS)
-            pixmap = QPixmap(path).scaled(
-                self.img_width,
-                int(self.img_width * 9 / 16),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            return pixmap
-        except Exception as e:
-            print(f"Error loading {path}: {e}")
-            # Return empty placeholder pixmap
-            placeholder = QPixmap(self.img_width, int(self.img_width*9/16))
-            placeholder.fill(Qt.GlobalColor.darkGray)
-            return placeholder
+        self.placeholder_label.show()
+        self._place_placeholder()
+
+    # --- Virtualization ---
+    def cell_size(self):
+        frame = 2 * (CELL_PADDING + CELL_BORDER)
+        return self.img_width + frame, self.box_height + CELL_PADDING + NAME_HEIGHT + frame
+
+    def _update_scrollbars(self):
+        vp = self.viewport().size()
+        cell_w, cell_h = self.cell_size()
+        rows = -(-len(self.images) // self.max_columns)
+        content_h = 2 * GRID_MARGIN + rows * (cell_h + GRID_SPACING) - GRID_SPACING if rows else 0
+        content_w = 2 * GRID_MARGIN + self.max_columns * (cell_w + GRID_SPACING) - GRID_SPACING if rows else 0
+        self.verticalScrollBar().setRange(0, max(0, content_h - vp.height()))
+        self.verticalScrollBar().setPageStep(vp.height())
+        self.horizontalScrollBar().setRange(0, max(0, content_w - vp.width()))
+        self.horizontalScrollBar().setPageStep(vp.width())
+
+    def _visible_range(self):
+        cell_w, cell_h = self.cell_size()
+        pitch = cell_h + GRID_SPACING
+        vp_h = self.viewport().height()
+        top = self.verticalScrollBar().value() - vp_h * OVERSCAN - GRID_MARGIN
+        bottom = self.verticalScrollBar().value() + vp_h * (1 + OVERSCAN) - GRID_MARGIN
+        first = max(0, int(top // pitch)) * self.max_columns
+        last = (int(bottom // pitch) + 1) * self.max_columns
+        return range(first, min(last, len(self.images)))
+
+    def _update_visible(self):
+        wanted = set(self._visible_range())
+        for index in list(self._bound):
+            if index not in wanted:
+                self._release(index)
+        cell_w, cell_h = self.cell_size()
+        dx = GRID_MARGIN - self.horizontalScrollBar().value()
+        dy = GRID_MARGIN - self.verticalScrollBar().value()
+        for index in wanted:
+            cell = self._bound.get(index)
+            if cell is None:
+                cell = self._free.pop() if self._free else _Cell(self.viewport(), self.img_width, self.box_height)
+                self._bind(index, cell)
+                cell.show()
+            row, col = divmod(index, self.max_columns)
+            cell.setGeometry(dx + col * (cell_w + GRID_SPACING), dy + row * (cell_h + GRID_SPACING), cell_w, cell_h)
+
+    def _bind(self, index, cell):
+        self._bound[index] = cell
+        thumb = self._thumbs.get(index)
+        cell.bind(self.images[index], thumb, index in self._failed)
+        if thumb is None and index not in self._failed and index not in self._decoding:
+            # Evicted from the LRU: decode it again unless it scrolls away first
+            self._decode(index, self._bound)
+
+    def _release(self, index):
+        cell = self._bound.pop(index)
+        cell.hide()
+        cell.img_label.clear()
+        self._free.append(cell)
+
+    def _release_all(self):
+        for index in list(self._bound):
+            self._release(index)
+
+    def _place_placeholder(self):
+        self.placeholder_label.setGeometry(self.viewport().rect().adjusted(
+            GRID_MARGIN, GRID_MARGIN, -GRID_MARGIN, -GRID_MARGIN))
+
+    def scrollContentsBy(self, dx, dy):
+        self._update_visible()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._place_placeholder()
+        self._update_scrollbars()
+        self._update_visible()
 
     # --- Drag & Drop support ---
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
             event.acceptProposedAction()
 
+    def dragMoveEvent(self, event: QDragMoveEvent):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
     def dropEvent(self, event: QDropEvent):
         urls = event.mimeData().urls()
         paths = [url.toLocalFile() for url in urls if url.isLocalFile()]
         if paths:
-            self.add_images(paths)
-            self.images_dropped.emit(paths)
+            self.add_dropped(paths)
+
+    def add_dropped(self, paths):
+        """Add dropped files and folders; folders are listed in the background and fill in batch by batch."""
+        thread = _DropListThread(paths, self._generation, self._backlog)
+        thread.batch_found.connect(self._on_batch_found)
+        thread.finished.connect(lambda: self._on_list_finished(thread))
+        self._list_threads.append(thread)
+        thread.start()
+
+    def _on_list_finished(self, thread):
+        # finished is emitted before the thread exits: wait, or dropping the last reference destroys it while running
+        thread.wait()
+        if thread in self._list_threads:
+            self._list_threads.remove(thread)
+
+    def _on_batch_found(self, generation, paths):
+        if generation != self._generation:
+            return
+        self.add_images(paths)
+        self.images_dropped.emit(paths)
+
+    def _stop_listing(self):
+        for thread in self._list_threads:
+            thread.requestInterruption()
+
+    def stop(self):
+        """Stop listing drops and wait for running decodes (before closing the window)."""
+        self._stop_listing()
+        self.pool.clear()
+        for thread in list(self._list_threads):
+            thread.wait()
+        self.pool.waitForDone()
@@ -0,0 +1,171 @@
+# diff_engine.py
+# Pixel differences of every sample of a tag against a reference sample (no Qt).
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+from thumbnail_cache import cache_key, load_thumbnail_buffer
+from thumbnails import Thumbnail
+from worker_pool import ordered_map
+
+DEFAULT_THRESHOLD = 32  # per-pixel difference (0-255) counted as "changed"
+DEFAULT_MAX_MB = 256
+SCORE_NBYTES = 200  # what a cached score without a map is counted as
+
+
+class DiffScore:
+    """Summary of one sample against the reference; diff is its difference map as an "L" Thumbnail, or None."""
+    __slots__ = ("mean", "max", "over", "over_fraction", "diff")
+
+    def __init__(self, mean, max, over, over_fraction, diff=None):
+        self.mean = mean
+        self.max = max
+        self.over = over
+        self.over_fraction = over_fraction
+        self.diff = diff
+
+    @property
+    def nbytes(self):
+        return self.diff.nbytes if self.diff is not None else SCORE_NBYTES
+
+
+def thumbnail_to_array(thumb, size=None):
+    """HxWx3 uint8 array of thumb, resized to size (w, h) when given and different."""
+    img = thumb.to_pil()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if size is not None and img.size != size:
+        img = img.resize(size, Image.BILINEAR)
+    return np.asarray(img)
+
+
+def diff_arrays(reference, other, threshold=DEFAULT_THRESHOLD):
+    """Difference map (largest channel difference per pixel, uint8 HxW) and its DiffScore."""
+    diff = np.abs(reference.astype(np.int16) - other.astype(np.int16)).max(axis=2).astype(np.uint8)
+    over = int(np.count_nonzero(diff > threshold))
+    score = DiffScore(float(diff.mean()), int(diff.max()), over, over / diff.size)
+    return diff, score
+
+
+def diff_tag_job(reference_path, paths, max_width, quality, threshold, keep_maps=False):
+    """
+    Worker entry point: decode the reference once and diff every path against it.
+    Thumbnails come from the disk cache, so a loaded folder is not decoded again.
+    Returns a list of DiffScore/None in the order of paths, None if the reference
+    fails. keep_maps attaches the difference maps to the scores.
+    """
+    ref_thumb = load_thumbnail_buffer(reference_path, max_width, quality)
+    if ref_thumb is None:
+        return None
+    reference = thumbnail_to_array(ref_thumb)
+    size = (ref_thumb.width, ref_thumb.height)
+    scores = []
+    for path in paths:
+        thumb = load_thumbnail_buffer(path, max_width, quality)
+        if thumb is None:
+            scores.append(None)
+            continue
+        diff, score = diff_arrays(reference, thumbnail_to_array(thumb, size), threshold)
+        if keep_maps:
+            score.diff = Thumbnail(diff.shape[1], diff.shape[0], "L", diff.tobytes())
+        scores.append(score)
+    return scores
+
+
+class DiffEngine:
+    """
+    Scores every sample of each tag against a reference sample in the process
+    pool, one job per tag. Results are cached for the session, keyed by both
+    files (path, size, mtime), the thumbnail size and the threshold, so scoring
+    the same run again or with another subset of tags is nearly free. The
+    cache holds at most max_mb, difference maps included.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_mb=DEFAULT_MAX_MB):
+        self.threshold = threshold
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # pair key -> DiffScore, LRU order
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, store, ref_path, path):
+        return (cache_key(ref_path, store.max_width, store.quality),
+                cache_key(path, store.max_width, store.quality),
+                self.threshold)
+
+    def _get(self, key):
+        with self._lock:
+            score = self._entries.get(key)
+            if score is not None:
+                self._entries.move_to_end(key)
+            return score
+
+    def _put(self, key, score):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = score
+            self._bytes += score.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def score_tags(self, store, reference, tags=None, workers=None, should_stop=None, progress=None,
+                   keep_maps=False):
+        """
+        {tag: {sample: DiffScore}} for the samples of each tag (default: all
+        tags of store) against the reference sample. Tags without a
+        reference image are left out. keep_maps also returns the difference
+        maps (DiffScore.diff). progress(done, total, tag) is called per tag;
+        raises worker_pool.Cancelled when should_stop() turns true.
+        """
+        tags = store.tags() if tags is None else list(tags)
+        results = {}
+        jobs = []  # (tag, [(sample, key, path)], job args)
+        for tag in tags:
+            ref_path = store.path(tag, reference)
+            if ref_path is None:
+                continue
+            results[tag] = {}
+            missing = []
+            for sample in store.samples:
+                path = store.path(tag, sample)
+                if path is None or sample == reference:
+                    continue
+                try:
+                    key = self._key(store, ref_path, path)
+                except OSError as e:
+                    print(f"Unable to diff {path}: {e}")
+                    continue
+                score = self._get(key)
+                # Scores cached without a map do not answer a keep_maps query
+                if score is not None and (score.diff is not None or not keep_maps):
+                    self.hits += 1
+                    results[tag][sample] = score
+                else:
+                    self.misses += 1
+                    missing.append((sample, key, path))
+            if missing:
+                jobs.append((tag, missing, (ref_path, [path for _, _, path in missing], store.max_width,
+                                            store.quality, self.threshold, keep_maps)))
+
+        total = len(results)
+        done = total - len(jobs)
+        for (tag, missing, _), scores in zip(jobs, ordered_map(diff_tag_job, (args for _, _, args in jobs),
+                                                               workers, should_stop=should_stop)):
+            for (sample, key, _), score in zip(missing, scores or ()):
+                if score is not None:
+                    self._put(key, score)
+                    results[tag][sample] = score
+            done += 1
+            if progress:
+                progress(done, total, tag)
+        return results
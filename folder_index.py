@@ -0,0 +1,225 @@
+# folder_index.py
+# Persistent listing of a loaded folder, so reopening a huge tree skips the full walk (no Qt).
+import os
+import time
+import hashlib
+import sqlite3
+from array import array
+from contextlib import closing
+from itertools import repeat
+from thumbnail_cache import CACHE_FILE
+
+INDEX_VERSION = "4"
+INDEX_DIR = os.path.join(os.path.dirname(CACHE_FILE), "folder_index")
+
+
+def stale_dirs(dirs):
+    """
+    Directories of a FolderState listing whose mtime is not the recorded one
+    (or that vanished). Only compared for equality, so clock skew between
+    this machine and a network share does not hide changes.
+    """
+    stale = []
+    for path, (_, _, mtime_ns) in dirs.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                stale.append(path)
+        except OSError:
+            stale.append(path)
+    return stale
+
+
+class FolderIndex:
+    """
+    One SQLite file per root folder holding what scan_folder() found: the
+    sample list, the resolved tag_map, the listing of every directory
+    (see scanner.FolderState) and the thumbnail size of every image, so the
+    Folder View can be laid out before decoding. Loading it takes a fraction of a second even
+    for hundreds of thousands of images; stale_dirs() then tells which
+    directories have to be listed again. Every call opens its own
+    connection, so the index can be used from any thread.
+    """
+
+    def __init__(self, base_path, index_dir=INDEX_DIR):
+        self.base_path = os.path.abspath(base_path)
+        digest = hashlib.sha1(os.path.normcase(self.base_path).encode("utf-8")).hexdigest()
+        self.path = os.path.join(index_dir, f"{digest}.sqlite")
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables(conn)
+        return conn
+
+    @staticmethod
+    def _create_tables(conn):
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        # names: the images of the directory, stamps: their (mtime_ns, size) as int64 pairs in that order
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path TEXT PRIMARY KEY, active TEXT NOT NULL, names TEXT NOT NULL, stamps BLOB NOT NULL,"
+            " mtime_ns INTEGER NOT NULL)"
+        )
+        # One row per tag (sample ids and paths joined), a tenth of the rows to read;
+        # sizes: thumbnail (width, height) per path as int32 pairs, 0 0 if it did not decode
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tags ("
+            " tag TEXT PRIMARY KEY, samples TEXT NOT NULL, paths TEXT NOT NULL, sizes BLOB NOT NULL)"
+        )
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self, max_width=None, quality=None):
+        """
+        (samples, tag_map, dirs, sizes, stats) as saved, or None if there is
+        no usable index. sizes maps (tag, sample) to the thumbnail size, only
+        filled when the index was saved with thumbnails of max_width and quality.
+        """
+        if not self.exists():
+            return None
+        t_start = time.perf_counter()
+        try:
+            with closing(self._connect()) as conn:
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                if meta.get("version") != INDEX_VERSION or meta.get("root") != self.base_path:
+                    return None
+                samples = meta["samples"].split("\n") if meta["samples"] else []
+                with_sizes = (max_width is not None and meta.get("thumb_width") == str(max_width)
+                              and meta.get("quality") == quality)
+                dirs = {}
+                for path, active, names, stamps, mtime_ns in conn.execute(
+                        "SELECT path, active, names, stamps, mtime_ns FROM dirs"):
+                    dirs[path] = (tuple(map(int, active.split(","))) if active else (),
+                                  self._parse_files(names, stamps), mtime_ns)
+                tag_map = {}
+                sizes = {}
+                n_images = 0
+                for tag, sample_ids, paths, tag_sizes in conn.execute("SELECT tag, samples, paths, sizes FROM tags"):
+                    paths = paths.split("\n")
+                    tag_samples = [samples[int(i)] for i in sample_ids.split(",")]
+                    tag_map[tag] = dict(zip(tag_samples, paths))
+                    n_images += len(paths)
+                    if with_sizes:
+                        self._parse_sizes(tag, tag_samples, tag_sizes, sizes)
+        except (sqlite3.Error, KeyError, IndexError, ValueError) as e:
+            print(f"Folder index unusable, scanning instead: {e}")
+            return None
+        stats = {
+            "dirs": len(dirs),
+            "files": int(meta.get("files", 0)),
+            "images": n_images,
+            "tags": len(tag_map),
+            "walk_s": time.perf_counter() - t_start,
+            "sort_s": 0.0,
+            "cancelled": False,
+            "indexed": True,
+        }
+        return samples, tag_map, dirs, sizes, stats
+
+    def save(self, samples, tag_map, dirs, n_files=0, store=None):
+        """Replace the whole index in one transaction; thumbnail sizes are taken from store (ImageStore)."""
+        sample_ids = {s: i for i, s in enumerate(samples)}
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Dropped rather than emptied, an index of an older version has other columns
+                for table in ("meta", "dirs", "tags"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._create_tables(conn)
+                conn.executemany("INSERT INTO meta(key, value) VALUES (?, ?)", [
+                    ("version", INDEX_VERSION), ("root", self.base_path),
+                    ("samples", "\n".join(samples)), ("files", str(n_files)),
+                ] + self._thumb_meta(store))
+                conn.executemany("INSERT INTO dirs(path, active, names, stamps, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                                 (self._dir_row(path, state) for path, state in dirs.items()))
+                conn.executemany("INSERT INTO tags(tag, samples, paths, sizes) VALUES (?, ?, ?, ?)",
+                                 (self._tag_row(tag, paths, sample_ids, store) for tag, paths in tag_map.items()))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update(self, samples, tag_map, dirs, paths, tags, store=None):
+        """
+        Rewrite only the directories in paths (deleting those no longer in
+        dirs, with everything below them) and the entries of tags, after an
+        incremental refresh. Thumbnail sizes of tags are taken from store; if
+        its width or quality differs from the saved one, the sizes are dropped.
+        """
+        sample_ids = {s: i for i, s in enumerate(samples)}
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('samples', ?)", ("\n".join(samples),))
+                meta = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('thumb_width', 'quality')"))
+                if sorted(meta.items()) != sorted(self._thumb_meta(store)):
+                    # Sizes of two widths must not mix: forget all, the next full load saves them again
+                    conn.execute("DELETE FROM meta WHERE key IN ('thumb_width', 'quality')")
+                for path in paths:
+                    state = dirs.get(path)
+                    if state is not None:
+                        conn.execute("INSERT OR REPLACE INTO dirs(path, active, names, stamps, mtime_ns) "
+                                     "VALUES (?, ?, ?, ?, ?)", self._dir_row(path, state))
+                    else:
+                        prefix = path + os.sep
+                        conn.execute("DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+                                     (path, len(prefix), prefix))
+                for tag in tags:
+                    tag_paths = tag_map.get(tag)
+                    if tag_paths:
+                        conn.execute("INSERT OR REPLACE INTO tags(tag, samples, paths, sizes) VALUES (?, ?, ?, ?)",
+                                     self._tag_row(tag, tag_paths, sample_ids, store))
+                    else:
+                        conn.execute("DELETE FROM tags WHERE tag = ?", (tag,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _dir_row(path, state):
+        active, files, mtime_ns = state
+        stamps = array("q", [value for stamp in files.values() for value in stamp])
+        return path, ",".join(map(str, active)), "\n".join(files), stamps.tobytes(), mtime_ns
+
+    @staticmethod
+    def _parse_files(names, stamps):
+        if not names:
+            return {}
+        # Packed integers load about twice as fast as parsing them from text
+        values = array("q")
+        values.frombytes(stamps)
+        names = names.split("\n")
+        if len(values) != 2 * len(names):
+            raise ValueError("file stamps do not match the names")
+        return dict(zip(names, zip(values[0::2], values[1::2])))
+
+    @staticmethod
+    def _thumb_meta(store):
+        if store is None:
+            return []
+        return [("thumb_width", str(store.max_width)), ("quality", store.quality)]
+
+    @staticmethod
+    def _tag_row(tag, paths, sample_ids, store=None):
+        sizes = array("i")
+        for sample in paths:
+            size = store.size(tag, sample) if store is not None else None
+            sizes.extend(size or (0, 0))
+        return tag, ",".join(str(sample_ids[s]) for s in paths), "\n".join(paths.values()), sizes.tobytes()
+
+    @staticmethod
+    def _parse_sizes(tag, samples, data, sizes):
+        values = array("i")
+        values.frombytes(data)
+        if len(values) != 2 * len(samples):
+            raise ValueError("thumbnail sizes do not match the paths")
+        widths = values[0::2]
+        pairs = zip(zip(repeat(tag), samples), zip(widths, values[1::2]))
+        if 0 in widths:
+            # Images that did not decode have no size
+            pairs = (pair for pair in pairs if pair[1][0])
+        sizes.update(pairs)
@@ -0,0 +1,489 @@
+# folder_view.py
+# Virtualized Folder View: tag blocks are laid out arithmetically and widgets
+# exist only for the blocks near the viewport. Off-screen blocks are recycled.
+from bisect import bisect_left, bisect_right, insort
+from PyQt6.QtWidgets import QAbstractScrollArea, QWidget, QLabel
+from PyQt6.QtCore import Qt, pyqtSignal, QObject, QRunnable, QThreadPool
+from qt_images import qimage_to_pixmap, thumbnail_to_qimage
+from worker_pool import default_workers
+
+# Geometry (px) of a tag block, matching the old QGridLayout based view
+OUTER_MARGIN = 5
+BLOCK_SPACING = 10
+BLOCK_MARGIN = 10
+CELL_SPACING = 10
+HEADER_HEIGHT = 40
+SAMPLE_LABEL_HEIGHT = 30
+PLACEHOLDER_HEIGHT = 100
+CELL_BORDER = 3  # 1px container border + 2px image label border
+OVERSCAN = 1.0  # extra viewport heights kept alive above and below
+
+VIEW_STYLE = """
+QWidget#tagBlock { background-color: #ADD8E6; }
+QLabel#tagHeader {
+    font-weight: bold;
+    color: black;
+    font-size: 20px;
+    background-color: #e0eaff;
+    padding: 5px;
+}
+QWidget#cell { border: 1px solid black; }
+QLabel#cellImage {
+    border: 2px solid black;
+    border-radius: 5px;
+}
+QLabel#cellImage:hover {
+    border: 2px solid red;
+    background-color: rgba(42, 130, 218, 0.1);
+}
+QLabel#cellSample {
+    color: black;
+    font-size: 18px;
+    border: 2px solid black;
+    background-color: white;
+}
+"""
+
+
+def shown_height(size, img_width):
+    """Height of a (width, height) thumbnail scaled to img_width."""
+    return max(1, round(size[1] / size[0] * img_width))
+
+
+class ClickableLabel(QLabel):
+    clicked = pyqtSignal()
+    def mousePressEvent(self, event):
+        self.clicked.emit()
+        super().mousePressEvent(event)
+
+
+class _ReloadSignals(QObject):
+    done = pyqtSignal(object, dict)  # _ReloadTask, {sample: Thumbnail or None}
+
+
+class _ReloadTask(QRunnable):
+    """Decodes the evicted thumbnails of one tag again on the thread pool."""
+
+    def __init__(self, signals, store, tag, samples):
+        super().__init__()
+        self.setAutoDelete(False)  # the view keeps it until done is handled
+        self.signals = signals
+        self.store = store
+        self.tag = tag
+        self.samples = samples
+        self.cancelled = False  # set when the block scrolled away
+
+    def run(self):
+        thumbs = {}
+        for sample in self.samples:
+            if self.cancelled:
+                break
+            thumbs[sample] = self.store.get(self.tag, sample)
+        self.signals.done.emit(self, thumbs)
+
+
+class _Cell(QWidget):
+    """Image + sample name. Reused across tags when its block is recycled."""
+
+    def __init__(self, parent, view):
+        super().__init__(parent)
+        self.setObjectName("cell")
+        self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground)
+        self.path = None
+        self.img_width = 0
+        self.img_height = PLACEHOLDER_HEIGHT
+        self.img_label = ClickableLabel(self)
+        self.img_label.setObjectName("cellImage")
+        self.img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.img_label.clicked.connect(lambda: self.path and view.image_clicked.emit(self.path))
+        self.sample_label = QLabel(self)
+        self.sample_label.setObjectName("cellSample")
+        self.sample_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+    def bind(self, sample, thumb, path, img_width, evicted_size=None):
+        """evicted_size: (width, height) of a thumbnail being reloaded, shown as a placeholder that big."""
+        pixmap = qimage_to_pixmap(thumbnail_to_qimage(thumb))
+        self.path = path if pixmap or evicted_size else None
+        if pixmap:
+            # The store may hold another width than shown (changed since loading)
+            if pixmap.width() != img_width:
+                pixmap = pixmap.scaled(img_width, shown_height(thumb.size, img_width),
+                                       Qt.AspectRatioMode.IgnoreAspectRatio,
+                                       Qt.TransformationMode.SmoothTransformation)
+            self.img_label.setPixmap(pixmap)
+            self.img_label.setText("")
+            self.img_height = pixmap.height()
+            self.img_label.setCursor(Qt.CursorShape.PointingHandCursor)
+        elif evicted_size:
+            self.img_label.clear()
+            self.img_label.setText("Loading...")
+            self.img_height = shown_height(evicted_size, img_width)
+            self.img_label.setCursor(Qt.CursorShape.PointingHandCursor)
+        else:
+            self.img_label.clear()
+            self.img_label.setText("No image")
+            self.img_height = PLACEHOLDER_HEIGHT
+            self.img_label.unsetCursor()
+        self.img_width = img_width
+        self.sample_label.setText(sample)
+
+    def place(self, row_height):
+        label_w = self.img_width + 2 * (CELL_BORDER - 1)
+        self.img_label.setGeometry(1, 1, label_w, self.img_height + 2 * (CELL_BORDER - 1))
+        self.sample_label.setGeometry(1, row_height - SAMPLE_LABEL_HEIGHT - 1, label_w, SAMPLE_LABEL_HEIGHT)
+        self.resize(self.img_width + 2 * CELL_BORDER, row_height)
+
+
+class _TagBlock(QWidget):
+    def __init__(self, view):
+        super().__init__(view.viewport())
+        self.setObjectName("tagBlock")
+        self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground)
+        self.view = view
+        self.tag = None
+        self.header = QLabel(self)
+        self.header.setObjectName("tagHeader")
+        self.header.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
+        self.cells = []
+
+    def bind(self, tag, reloaded=None):
+        """
+        Show the thumbnails of tag that are in memory; evicted ones get a
+        placeholder and are reloaded in the background. reloaded holds
+        thumbnails just decoded for this block, used even if evicted again.
+        """
+        view = self.view
+        self.tag = tag
+        store = view.store
+        self.header.setText(f"tag: {tag}")
+        while len(self.cells) < len(view.samples):
+            self.cells.append(_Cell(self, view))
+        missing = []
+        for sample, cell in zip(view.samples, self.cells):
+            if reloaded is not None and sample in reloaded:
+                thumb, evicted = reloaded[sample], False
+            else:
+                thumb, evicted = store.peek(tag, sample)
+            size = store.size(tag, sample) if evicted else None
+            if evicted:
+                missing.append(sample)
+            cell.bind(sample, thumb, store.path(tag, sample), view.img_width, size)
+        self.place()
+        if missing:
+            view.reload(tag, missing)
+
+    def place(self):
+        """Position the bound cells for the view's current column count."""
+        view = self.view
+        row_heights = view.row_heights[self.tag]
+        cell_w = view.cell_width()
+        width = view.block_width()
+        self.header.setGeometry(BLOCK_MARGIN, BLOCK_MARGIN, width - 2 * BLOCK_MARGIN, HEADER_HEIGHT)
+
+        y = BLOCK_MARGIN + HEADER_HEIGHT + CELL_SPACING
+        for idx, cell in enumerate(self.cells):
+            if idx >= len(view.samples):
+                cell.hide()
+                continue
+            row, col = divmod(idx, view.max_columns)
+            if col == 0 and row > 0:
+                y += row_heights[row - 1] + CELL_SPACING
+            cell.place(row_heights[row])
+            cell.move(BLOCK_MARGIN + col * (cell_w + CELL_SPACING), y)
+            cell.show()
+        self.resize(width, view.heights[view.index[self.tag]])
+
+
+class FolderGridView(QAbstractScrollArea):
+    """
+    Scrollable list of tag blocks (one block = all samples of a tag).
+    Block heights are computed from the thumbnail sizes recorded in the
+    ImageStore, so adding tags is cheap; pixels are fetched from the store
+    only for the visible blocks.
+    """
+    image_clicked = pyqtSignal(str)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.viewport().setStyleSheet(VIEW_STYLE)
+        self.verticalScrollBar().setSingleStep(40)
+        self.horizontalScrollBar().setSingleStep(40)
+        self.samples = []
+        self.tags = []
+        self.index = {}
+        self.row_heights = {}
+        self._aspects = {}
+        self.heights = []
+        self.offsets = []
+        self.max_columns = 4
+        self.img_width = 350
+        self._content_height = 0
+        self._bound = {}  # tag -> _TagBlock
+        self._free = []
+        # Evicted thumbnails of bound blocks are decoded again off the GUI thread
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(default_workers())
+        self._reload_signals = _ReloadSignals()
+        self._reload_signals.done.connect(self._on_reloaded)
+        self._reloads = {}  # tag -> _ReloadTask of a bound block
+        self._tasks = set()  # every task not done yet, kept alive for the pool
+
+    # --- Data ---
+    def set_samples(self, samples, max_columns, img_width):
+        """Start a new (empty) view; tags are added with append_tags()."""
+        self._release_all()
+        self.samples = list(samples)
+        self.tags = []
+        self.max_columns = max_columns
+        self.img_width = img_width
+        self._relayout()
+
+    def append_tags(self, tags):
+        """
+        Append tags (already in the store) after the existing ones.
+        Used while streaming, tags arrive already sorted. Only the new
+        blocks are laid out, existing offsets do not move.
+        """
+        start = len(self.tags)
+        for tag in tags:
+            self.index[tag] = len(self.tags)
+            self.tags.append(tag)
+        self._layout_from(start)
+        self._update_scrollbars()
+        self._update_visible()
+
+    def patch_tags(self, changed=(), removed=()):
+        """
+        Incremental update after a rescan: rebind the blocks of changed tags,
+        insert tags that are new and drop removed ones. Only blocks from the
+        first affected tag on are laid out again.
+        """
+        removed = {tag for tag in removed if tag in self.index}
+        changed = set(changed) - removed
+        new = sorted(tag for tag in changed if tag not in self.index)
+        affected = [self.index[tag] for tag in removed | (changed - set(new))]
+        affected += [bisect_left(self.tags, tag) for tag in new]
+        if not affected:
+            return
+        start = min(affected)
+
+        for tag in changed | removed:
+            if tag in self._bound:
+                self._release(tag)
+            self._aspects.pop(tag, None)
+        tail = [tag for tag in self.tags[start:] if tag not in removed]
+        for tag in new:
+            insort(tail, tag)
+        del self.tags[start:]
+        self.tags.extend(tail)
+        for tag in removed:
+            del self.index[tag]
+            self.row_heights.pop(tag, None)
+        for i in range(start, len(self.tags)):
+            self.index[self.tags[i]] = i
+        self._layout_from(start)
+        self._update_scrollbars()
+        self._update_visible()
+
+    def set_layout(self, max_columns, img_width):
+        """
+        Reflow to another column count or image width without touching the
+        store: a column change only moves the cells of the bound blocks, a
+        width change scales the stored thumbnails. The tag at the top of the
+        viewport stays there.
+        """
+        if (max_columns, img_width) == (self.max_columns, self.img_width):
+            return
+        anchor = self.top_tag()
+        if anchor is not None:
+            i = self.index[anchor]
+            fraction = (self.verticalScrollBar().value() - self.offsets[i]) / self.heights[i]
+        rebind = img_width != self.img_width
+        self.max_columns = max_columns
+        self.img_width = img_width
+        self._layout_from(0)
+        for tag, block in self._bound.items():
+            if rebind:
+                block.bind(tag)
+            else:
+                block.place()
+        self._update_scrollbars()
+        if anchor is not None:
+            i = self.index[anchor]
+            self.verticalScrollBar().setValue(self.offsets[i] + round(fraction * self.heights[i]))
+        self._update_visible()
+
+    def refresh_tags(self, tags):
+        """Show the thumbnails of tags again after they were replaced in the store."""
+        for tag in tags:
+            block = self._bound.get(tag)
+            if block is not None:
+                block.bind(tag)
+
+    def reload(self, tag, samples):
+        """Decode the evicted thumbnails samples of the bound block of tag again."""
+        if tag in self._reloads:
+            return
+        task = _ReloadTask(self._reload_signals, self.store, tag, samples)
+        self._reloads[tag] = task
+        self._tasks.add(task)
+        self.pool.start(task)
+
+    def _on_reloaded(self, task, thumbs):
+        self._tasks.discard(task)
+        if self._reloads.get(task.tag) is not task:
+            return
+        del self._reloads[task.tag]
+        block = self._bound.get(task.tag)
+        if block is not None:
+            block.bind(task.tag, thumbs)
+
+    def stop(self):
+        """Drop queued reloads and wait for the running ones (window closing)."""
+        for task in self._reloads.values():
+            task.cancelled = True
+        self._reloads.clear()
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def clear(self):
+        self._release_all()
+        for block in self._free:
+            block.deleteLater()
+        self._free.clear()
+        self.samples = []
+        self.tags = []
+        self._relayout()
+
+    def has_tag(self, tag):
+        return tag in self.index
+
+    def top_tag(self):
+        """Tag of the block at the top of the viewport, None when empty."""
+        if not self.tags:
+            return None
+        return self.tags[max(0, bisect_right(self.offsets, self.verticalScrollBar().value()) - 1)]
+
+    def scroll_to_tag(self, tag):
+        if tag in self.index:
+            self.verticalScrollBar().setValue(self.offsets[self.index[tag]])
+
+    # --- Geometry ---
+    def cell_width(self):
+        return self.img_width + 2 * CELL_BORDER
+
+    def block_width(self):
+        cols = max(1, min(self.max_columns, len(self.samples)))
+        return 2 * BLOCK_MARGIN + cols * self.cell_width() + (cols - 1) * CELL_SPACING
+
+    def _tag_aspects(self, tag):
+        """Height / width of every sample's thumbnail (-1 for missing ones), kept across reflows."""
+        aspects = self._aspects.get(tag)
+        if aspects is None:
+            aspects = []
+            for sample in self.samples:
+                size = self.store.size(tag, sample)
+                aspects.append(size[1] / size[0] if size else -1.0)
+            self._aspects[tag] = aspects
+        return aspects
+
+    def _row_heights(self, tags):
+        """Row heights (px) of the blocks of tags, as an array of shape (len(tags), rows)."""
+        import numpy as np  # first used when tags arrive, not at startup
+        cols = self.max_columns
+        n_rows = -(-len(self.samples) // cols)
+        aspects = np.zeros((len(tags), n_rows * cols))
+        if n_rows:
+            aspects[:, :len(self.samples)] = [self._tag_aspects(tag) for tag in tags]
+        rows = aspects.reshape(len(tags), n_rows, cols)
+        tallest = rows.max(axis=2)
+        # Thumbnails are scaled to img_width when bound, like shown_height()
+        tallest = np.where(tallest > 0, np.maximum(1, np.rint(tallest * self.img_width)), 0)
+        tallest = np.where(rows.min(axis=2) < 0, np.maximum(tallest, PLACEHOLDER_HEIGHT), tallest)
+        return tallest.astype(np.int64) + 2 * CELL_BORDER + SAMPLE_LABEL_HEIGHT
+
+    def _relayout(self):
+        self.index = {tag: i for i, tag in enumerate(self.tags)}
+        self.row_heights = {}
+        self._aspects = {}
+        self._layout_from(0)
+        self._update_scrollbars()
+        self._update_visible()
+
+    def _layout_from(self, start):
+        """(Re)compute offsets and heights of self.tags[start:]."""
+        del self.heights[start:]
+        del self.offsets[start:]
+        if start:
+            y = self.offsets[start - 1] + self.heights[start - 1] + BLOCK_SPACING
+        else:
+            y = OUTER_MARGIN
+        tags = self.tags[start:]
+        if tags:
+            import numpy as np
+            # Vectorized over all tags: reflowing 500k images takes about 0.1 s
+            rows = self._row_heights(tags)
+            heights = (2 * BLOCK_MARGIN + HEADER_HEIGHT + CELL_SPACING
+                       + rows.sum(axis=1) + CELL_SPACING * max(0, rows.shape[1] - 1))
+            offsets = y + np.concatenate(([0], np.cumsum(heights[:-1] + BLOCK_SPACING)))
+            self.row_heights.update(zip(tags, rows.tolist()))
+            self.heights.extend(heights.tolist())
+            self.offsets.extend(offsets.tolist())
+            y = self.offsets[-1] + self.heights[-1] + BLOCK_SPACING
+        self._content_height = y - BLOCK_SPACING + OUTER_MARGIN if self.tags else 0
+
+    def _update_scrollbars(self):
+        vp = self.viewport().size()
+        content_w = self.block_width() + 2 * OUTER_MARGIN if self.tags else 0
+        self.verticalScrollBar().setRange(0, max(0, self._content_height - vp.height()))
+        self.verticalScrollBar().setPageStep(vp.height())
+        self.horizontalScrollBar().setRange(0, max(0, content_w - vp.width()))
+        self.horizontalScrollBar().setPageStep(vp.width())
+
+    # --- Virtualization ---
+    def _visible_range(self):
+        if not self.tags:
+            return range(0)
+        vp_h = self.viewport().height()
+        top = self.verticalScrollBar().value() - vp_h * OVERSCAN
+        bottom = self.verticalScrollBar().value() + vp_h * (1 + OVERSCAN)
+        first = max(0, bisect_right(self.offsets, top) - 1)
+        last = bisect_right(self.offsets, bottom)
+        return range(first, min(last, len(self.tags)))
+
+    def _update_visible(self):
+        wanted = {self.tags[i] for i in self._visible_range()}
+        for tag in list(self._bound):
+            if tag not in wanted:
+                self._release(tag)
+        dx = OUTER_MARGIN - self.horizontalScrollBar().value()
+        dy = -self.verticalScrollBar().value()
+        for tag in wanted:
+            block = self._bound.get(tag)
+            if block is None:
+                block = self._free.pop() if self._free else _TagBlock(self)
+                block.bind(tag)
+                self._bound[tag] = block
+                block.show()
+            block.move(dx, self.offsets[self.index[tag]] + dy)
+
+    def _release(self, tag):
+        task = self._reloads.pop(tag, None)
+        if task is not None:
+            task.cancelled = True
+        block = self._bound.pop(tag)
+        block.hide()
+        self._free.append(block)
+
+    def _release_all(self):
+        for tag in list(self._bound):
+            self._release(tag)
+
+    def scrollContentsBy(self, dx, dy):
+        self._update_visible()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_scrollbars()
+        self._update_visible()
@@ -0,0 +1,176 @@
+# folder_watch.py
+# Watch mode: directory change notifications for the loaded folder, debounced.
+import os
+import threading
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QThread, QTimer, pyqtSignal
+from thumbnails import is_image_file
+
+DEBOUNCE_MS = 500  # quiet time before a batch of changes is reported
+MAX_FILE_WATCHES = 4096  # image files watched individually, the rest is polled
+POLL_FILES_PER_S = 5000  # stat() rate of the poller
+POLL_PASS_PAUSE_S = 2.0  # rest between two passes over the polled files
+
+
+class _FilePoller(QThread):
+    """
+    Stats the image files that did not get a watch of their own, one pass
+    after another at POLL_FILES_PER_S, and reports those whose modification
+    time or size changed.
+    """
+    file_changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._new = []
+        self._stats = {}  # path -> (st_mtime_ns, st_size), poller thread only
+
+    def add(self, paths):
+        with self._lock:
+            self._new.extend(paths)
+
+    def run(self):
+        batch = max(1, POLL_FILES_PER_S // 10)
+        while not self.isInterruptionRequested():
+            with self._lock:
+                new, self._new = self._new, []
+            for i, path in enumerate(new):
+                self._stats[path] = self._stat(path)
+                if i % batch == batch - 1:
+                    self._pause(0.1)
+            for i, (path, seen) in enumerate(list(self._stats.items())):
+                if self.isInterruptionRequested():
+                    return
+                # Deleted files stay listed (as None), they may be written again
+                now = self._stat(path)
+                if now != seen:
+                    self._stats[path] = now
+                    self.file_changed.emit(path)
+                if i % batch == batch - 1:
+                    self._pause(0.1)
+            self._pause(POLL_PASS_PAUSE_S)
+
+    def _pause(self, seconds):
+        for _ in range(round(seconds * 10)):
+            if self.isInterruptionRequested():
+                return
+            self.msleep(100)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+
+class FolderWatcher(QObject):
+    """
+    Watches the directories of a loaded folder (QFileSystemWatcher uses
+    inotify / ReadDirectoryChangesW / kqueue underneath) and reports the
+    directories that changed once writes have been quiet for DEBOUNCE_MS,
+    so a test run writing many files produces a few batched updates.
+
+    Directory watches do not report files rewritten in place on every
+    platform (inotify only sees create/delete/rename), so the image files
+    are watched individually as well, up to MAX_FILE_WATCHES; the others
+    are stat-polled in the background.
+    """
+    dirs_changed = pyqtSignal(list)  # changed directories
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._pending = set()
+        self._watched = set()  # image files with a watch of their own
+        self._polled = set()
+        self._poller = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(DEBOUNCE_MS)
+        self._timer.timeout.connect(self._flush)
+
+    def watch(self, paths, files=()):
+        """Watch the directories in paths and the image files in files."""
+        if paths:
+            failed = self._watcher.addPaths(paths)
+            if failed:
+                print(f"Unable to watch {len(failed)} directories (system watch limit?), e.g. {failed[0]}")
+        self._track(files)
+
+    def stop(self):
+        self._timer.stop()
+        self._pending.clear()
+        self._watched.clear()
+        self._polled.clear()
+        if self._poller is not None:
+            self._poller.requestInterruption()
+            self._poller.wait()
+            self._poller = None
+        watched = self._watcher.directories() + self._watcher.files()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def is_watching(self):
+        return bool(self._watcher.directories())
+
+    def _on_directory_changed(self, path):
+        self._pending.add(path)
+        self._timer.start()
+
+    def _on_file_changed(self, path):
+        self._on_directory_changed(os.path.dirname(path))
+
+    def _track(self, files):
+        current = None
+        new = []
+        for path in files:
+            if path in self._polled:
+                continue
+            if path in self._watched:
+                if current is None:
+                    current = set(self._watcher.files())
+                if path in current:
+                    continue
+                # Replaced by a rename or deleted: the watch went with the old file
+                self._watched.discard(path)
+            new.append(path)
+        if not new:
+            return
+        room = max(0, MAX_FILE_WATCHES - len(self._watched))
+        watched, polled = new[:room], new[room:]
+        if watched:
+            failed = self._watcher.addPaths(watched)
+            self._watched.update(set(watched).difference(failed))
+            # Out of system watches: poll those as well
+            polled = failed + polled
+        if polled:
+            self._polled.update(polled)
+            if self._poller is None:
+                self._poller = _FilePoller(self)
+                self._poller.file_changed.connect(self._on_file_changed)
+                self._poller.start()
+            self._poller.add(polled)
+
+    def _list_images(self, dirs):
+        files = []
+        for path in dirs:
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if is_image_file(entry.name) and entry.is_file():
+                            files.append(entry.path)
+            except OSError:
+                continue
+        return files
+
+    def _flush(self):
+        if self._pending:
+            pending = sorted(self._pending)
+            self._pending.clear()
+            # Images added to those directories
+            self._track(self._list_images(pending))
+            self.dirs_changed.emit(pending)
@@ -0,0 +1,177 @@
+# image_store.py
+# Single owner of the loaded thumbnails, shared by the Folder View and the export.
+import threading
+from collections import OrderedDict
+from thumbnails import DEFAULT_QUALITY
+from thumbnail_cache import load_thumbnail_buffer
+
+DEFAULT_BUDGET_MB = 512
+
+
+class ImageStore:
+    """
+    Thumbnails of the current folder keyed by (tag, sample), kept within a
+    memory budget. Least recently used thumbnails are dropped when the
+    budget is exceeded and decoded again (normally from the disk cache)
+    the next time they are needed. Safe to use from several threads.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (tag, sample) -> Thumbnail, LRU order
+        self._sizes = {}  # (tag, sample) -> (width, height), survives eviction
+        self._failed = set()
+        self._bytes = 0
+        self._generation = 0
+        self.samples = []
+        self.tag_map = {}
+        self.max_width = 350
+        self.quality = DEFAULT_QUALITY
+        self.reloads = 0
+
+    def reset(self, samples=(), tag_map=None, max_width=350, quality=DEFAULT_QUALITY):
+        """Forget everything and describe a new dataset."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._failed.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.samples = list(samples)
+            self.tag_map = tag_map or {}
+            self.max_width = max_width
+            self.quality = quality
+            self.reloads = 0
+
+    def set_max_width(self, max_width):
+        """Decode thumbnails from now on (including reloads) at max_width; loaded ones stay as they are."""
+        with self._lock:
+            self.max_width = max_width
+
+    def narrower_than(self, width):
+        """[(tag, sample)] of the loaded thumbnails narrower than width."""
+        with self._lock:
+            return [key for key, thumb in self._entries.items() if thumb.width < width]
+
+    def set_budget_mb(self, budget_mb):
+        with self._lock:
+            self.budget_bytes = budget_mb * 1024 * 1024
+            self._evict()
+
+    def tags(self):
+        return sorted(self.tag_map.keys())
+
+    def path(self, tag, sample):
+        return self.tag_map.get(tag, {}).get(sample)
+
+    def size(self, tag, sample):
+        """(width, height) of a loaded thumbnail, None if missing or not loaded yet."""
+        return self._sizes.get((tag, sample))
+
+    def set_sizes(self, sizes):
+        """
+        Sizes {(tag, sample): (width, height)} of thumbnails not decoded yet
+        (from the folder index): the view lays them out and get() decodes them.
+        """
+        with self._lock:
+            self._sizes.update(sizes)
+
+    def put(self, tag, sample, thumb):
+        with self._lock:
+            self._put(tag, sample, thumb)
+
+    def _put(self, tag, sample, thumb):
+        key = (tag, sample)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        if thumb is None:
+            self._failed.add(key)
+            self._sizes.pop(key, None)
+            return
+        self._failed.discard(key)
+        self._entries[key] = thumb
+        self._sizes[key] = thumb.size
+        self._bytes += thumb.nbytes
+        self._evict()
+
+    def update_paths(self, added, removed, samples=None):
+        """
+        Apply a rescan (see scanner.FolderState.rescan): added [(tag, sample, path)]
+        point to new or modified files and lose their thumbnail, removed ones
+        are dropped if the tag still points at that file. Returns the set of
+        tags that no longer have any image.
+        """
+        gone = set()
+        with self._lock:
+            if samples is not None:
+                self.samples = list(samples)
+            for tag, sample, path in removed:
+                paths = self.tag_map.get(tag)
+                if not paths or paths.get(sample) != path:
+                    continue
+                del paths[sample]
+                self._forget((tag, sample))
+                if not paths:
+                    del self.tag_map[tag]
+                    gone.add(tag)
+            for tag, sample, path in added:
+                self.tag_map.setdefault(tag, {})[sample] = path
+                self._forget((tag, sample))
+                gone.discard(tag)
+        return gone
+
+    def _forget(self, key):
+        thumb = self._entries.pop(key, None)
+        if thumb is not None:
+            self._bytes -= thumb.nbytes
+        self._sizes.pop(key, None)
+        self._failed.discard(key)
+
+    def peek(self, tag, sample):
+        """
+        (thumbnail, evicted) without decoding anything: thumbnail is None when
+        it is not in memory, evicted tells whether get() would decode it again.
+        """
+        key = (tag, sample)
+        with self._lock:
+            thumb = self._entries.get(key)
+            if thumb is not None:
+                self._entries.move_to_end(key)
+                return thumb, False
+            return None, key not in self._failed and self.path(tag, sample) is not None
+
+    def get(self, tag, sample):
+        """Thumbnail for (tag, sample), reloaded on demand; None if there is no image."""
+        key = (tag, sample)
+        with self._lock:
+            thumb = self._entries.get(key)
+            if thumb is not None:
+                self._entries.move_to_end(key)
+                return thumb
+            path = self.path(tag, sample)
+            if path is None or key in self._failed:
+                return None
+            max_width, quality = self.max_width, self.quality
+            generation = self._generation
+            self.reloads += 1
+        # Decode outside the lock, other threads keep working meanwhile
+        thumb = load_thumbnail_buffer(path, max_width, quality)
+        with self._lock:
+            if generation == self._generation:
+                self._put(tag, sample, thumb)
+        return thumb
+
+    def get_pil(self, tag, sample):
+        thumb = self.get(tag, sample)
+        return thumb.to_pil() if thumb is not None else None
+
+    def memory_bytes(self):
+        return self._bytes
+
+    def _evict(self):
+        # Always keep the newest entry, it is about to be used
+        while self._bytes > self.budget_bytes and len(self._entries) > 1:
+            _, thumb = self._entries.popitem(last=False)
+            self._bytes -= thumb.nbytes
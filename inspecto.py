@@ -0,0 +1,272 @@
+# inspecto.py
+# Command line batch mode, runs the scan/decode/export pipeline without Qt.
+#   python inspecto.py scan <folder>
+#   python inspecto.py thumbnails <folder> --width 350 --workers 16 --index
+#   python inspecto.py export <folder> -o out.pptx --columns 4 --workers 16
+#   python inspecto.py diff <folder> --reference ED_001 --maps diffs > scores.tsv
+#   python inspecto.py metrics <folder> --reference ED_001 -o metrics.xlsx
+#   python inspecto.py outliers <folder> --top 20
+#   python inspecto.py duplicates <folder> --distance 3
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import license_manager
+from folder_index import FolderIndex, stale_dirs
+from image_store import DEFAULT_BUDGET_MB, ImageStore
+from phash_index import MAX_DUPLICATE_DISTANCE, PHashIndex
+from pipeline import decode_folder, format_scan_stats, load_folder, refresh_folder
+from pptx_export import EXPORT_FORMATS, export_pptx
+from scanner import FolderState, scan_folder
+from thumbnail_cache import DEFAULT_MAX_MB, MAX_MB_ENV
+from thumbnails import DECODE_QUALITIES, DEFAULT_QUALITY
+from worker_pool import default_workers, shutdown_pools
+
+DIFF_MAP_BATCH = 64  # tags scored at once by diff --maps
+
+
+def print_progress(args):
+    if args.quiet:
+        return None
+    return lambda done, total, tag: print(f"[{done}/{total}] {tag}")
+
+
+def cmd_scan(args):
+    samples, tag_map, stats = scan_folder(args.folder)
+    print(format_scan_stats(stats))
+    print(f"Samples: {', '.join(samples)}")
+    if args.list:
+        for tag in sorted(tag_map.keys()):
+            print(f"{tag}\t{len(tag_map[tag])}/{len(samples)}")
+    return 0
+
+
+def load_decoded(args, store, hash_index=None):
+    """
+    load_folder() for the command line; with --index the saved folder index
+    replaces the scan and the directories changed since are listed again.
+    """
+    folder_index = FolderIndex(args.folder) if args.index else None
+    dirs = {}
+    samples, tag_map, stats = load_folder(args.folder, store, args.width, args.quality, args.workers,
+                                          on_tag=print_progress(args), hash_index=hash_index, dirs=dirs,
+                                          folder_index=folder_index)
+    if stats.get("indexed"):
+        stale = stale_dirs(dirs)
+        if stale:
+            changed, removed, _, _ = refresh_folder(FolderState(samples, dirs), stale, store, args.workers,
+                                                    hash_index, folder_index)
+            print(f"Listed {len(stale)} changed dirs again ({len(changed)} tags changed, {len(removed)} removed)")
+
+
+def cmd_thumbnails(args):
+    """Decode everything once so the GUI starts from a warm thumbnail cache."""
+    load_decoded(args, ImageStore(args.memory))
+    return 0
+
+
+def cmd_export(args):
+    if not license_manager.is_pro():
+        print("Export to PowerPoint is a Pro feature. Please activate your license in the GUI.")
+        return 1
+    store = ImageStore(args.memory)
+    samples, tag_map, stats = scan_folder(args.folder)
+    print(format_scan_stats(stats))
+    if not tag_map:
+        print("No images to export.")
+        return 1
+    store.reset(samples, tag_map, args.width, args.quality)
+    # Thumbnails are only embedded when neither the originals nor a render resolution is asked for
+    if args.format != "original" and not args.resolution:
+        decode_folder(store, args.workers)
+
+    t_export = time.perf_counter()
+    done = export_pptx(args.output, store.tags(), store.samples, store.get_pil, args.columns, args.workers,
+                       progress=print_progress(args), image_format=args.format,
+                       image_path=store.path, resolution=args.resolution)
+    print(f"Exported {done} slides to {args.output} in {time.perf_counter() - t_export:.2f} s")
+    return 0
+
+
+def cmd_diff(args):
+    """Tab separated scores of every sample against the reference sample."""
+    # numpy is only loaded by the commands that need it
+    from diff_engine import DEFAULT_THRESHOLD, DiffEngine
+    samples, tag_map, stats = scan_folder(args.folder)
+    print(format_scan_stats(stats), file=sys.stderr)
+    if args.reference not in samples:
+        print(f"Unknown reference sample {args.reference}, samples: {', '.join(samples)}", file=sys.stderr)
+        return 1
+    store = ImageStore(args.memory)
+    store.reset(samples, tag_map, args.width, args.quality)
+    t_diff = time.perf_counter()
+    threshold = DEFAULT_THRESHOLD if args.threshold is None else args.threshold
+    engine = DiffEngine(threshold)
+    tags = store.tags()
+    # With --maps the tags are scored in batches, so only one batch of maps is in memory
+    batch = DIFF_MAP_BATCH if args.maps else len(tags)
+    scored = maps = 0
+    print("tag\tsample\tmean\tmax\tover\tover_fraction")
+    for start in range(0, len(tags), max(1, batch)):
+        results = engine.score_tags(store, args.reference, tags[start:start + batch], args.workers,
+                                    keep_maps=bool(args.maps))
+        for tag, scores in results.items():
+            for sample, score in scores.items():
+                print(f"{tag}\t{sample}\t{score.mean:.3f}\t{score.max}\t{score.over}\t{score.over_fraction:.5f}")
+                if args.maps and score.over:
+                    save_diff_map(score.diff, os.path.join(args.maps, sample, tag))
+                    maps += 1
+        scored += len(results)
+    print(f"Scored {scored} tags in {time.perf_counter() - t_diff:.2f} s", file=sys.stderr)
+    if args.maps:
+        print(f"Wrote {maps} difference maps to {args.maps}", file=sys.stderr)
+    return 0
+
+
+def save_diff_map(diff, path):
+    """Difference map (an "L" Thumbnail, brighter = more changed) as a PNG next to its tag name."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    diff.to_pil().save(os.path.splitext(path)[0] + ".png")
+
+
+def cmd_metrics(args):
+    from metrics import write_metrics_xlsx
+    samples, tag_map, stats = scan_folder(args.folder)
+    print(format_scan_stats(stats))
+    if args.reference not in samples:
+        print(f"Unknown reference sample {args.reference}, samples: {', '.join(samples)}")
+        return 1
+    store = ImageStore(args.memory)
+    store.reset(samples, tag_map, args.width, args.quality)
+    t_metrics = time.perf_counter()
+    pairs = write_metrics_xlsx(args.output, store, args.reference, args.workers, progress=print_progress(args))
+    print(f"Wrote SSIM / PSNR of {pairs} pairs to {args.output} in {time.perf_counter() - t_metrics:.2f} s")
+    return 0
+
+
+def hash_folder(args):
+    """Decode (normally from the thumbnail cache) and hash every image of the folder."""
+    hash_index = PHashIndex()
+    load_decoded(args, ImageStore(args.memory), hash_index)
+    return hash_index
+
+
+def cmd_outliers(args):
+    hash_index = hash_folder(args)
+    t_query = time.perf_counter()
+    outliers = hash_index.outliers(args.top, args.min_distance)
+    print(f"{len(outliers)} outliers among {len(hash_index)} images in {(time.perf_counter() - t_query) * 1000:.1f} ms")
+    for distance, tag, sample in outliers:
+        print(f"{distance}\t{tag}\t{sample}")
+    return 0
+
+
+def cmd_duplicates(args):
+    if not 0 <= args.distance <= MAX_DUPLICATE_DISTANCE:
+        print(f"--distance must be between 0 and {MAX_DUPLICATE_DISTANCE}")
+        return 1
+    hash_index = hash_folder(args)
+    t_query = time.perf_counter()
+    pairs = hash_index.near_duplicates(args.distance, not args.same_tag, args.limit)
+    print(f"{len(pairs)} near-duplicate pairs among {len(hash_index)} images "
+          f"in {(time.perf_counter() - t_query) * 1000:.1f} ms")
+    for distance, (tag_a, sample_a), (tag_b, sample_b) in pairs:
+        print(f"{distance}\t{tag_a}\t{sample_a}\t{tag_b}\t{sample_b}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="inspecto", description="Inspecto batch mode (no GUI).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub):
+        sub.add_argument("folder", help="folder containing the ED* sample directories")
+        sub.add_argument("--workers", type=int, default=default_workers(),
+                         help="number of decoding processes (default: %(default)s)")
+        sub.add_argument("--width", type=int, default=350, help="thumbnail width (default: %(default)s)")
+        sub.add_argument("--quality", choices=DECODE_QUALITIES, default=DEFAULT_QUALITY,
+                         help="thumbnail decode quality (default: %(default)s)")
+        sub.add_argument("--memory", type=int, default=DEFAULT_BUDGET_MB,
+                         help="memory budget for thumbnails in MB (default: %(default)s)")
+        sub.add_argument("--cache-mb", type=int,
+                         help=f"size cap of the disk thumbnail cache in MB (default: ${MAX_MB_ENV} or {DEFAULT_MAX_MB})")
+        sub.add_argument("-q", "--quiet", action="store_true", help="no per-tag progress output")
+
+    def add_index(sub):
+        sub.add_argument("--index", action="store_true",
+                         help="start from the saved folder index (shared with the GUI) instead of a full scan")
+
+    scan = commands.add_parser("scan", help="list samples and tags")
+    scan.add_argument("folder", help="folder containing the ED* sample directories")
+    scan.add_argument("--list", action="store_true", help="print every tag with its sample count")
+    scan.set_defaults(func=cmd_scan)
+
+    thumbnails = commands.add_parser("thumbnails", help="fill the thumbnail cache")
+    add_common(thumbnails)
+    add_index(thumbnails)
+    thumbnails.set_defaults(func=cmd_thumbnails)
+
+    export = commands.add_parser("export", help="export a PowerPoint deck, one slide per tag")
+    add_common(export)
+    export.add_argument("-o", "--output", required=True, help="output .pptx file")
+    export.add_argument("--columns", type=int, default=4, help="images per slide row (default: %(default)s)")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="auto",
+                        help="image format in the deck (default: %(default)s)")
+    export.add_argument("--resolution", type=int, default=0,
+                        help="slide width in pixels the originals are rendered for, "
+                             "0 embeds the thumbnails (default: %(default)s)")
+    export.set_defaults(func=cmd_export)
+
+    diff = commands.add_parser("diff", help="score every sample against a reference sample")
+    add_common(diff)
+    diff.add_argument("--reference", required=True, help="name of the reference sample directory")
+    diff.add_argument("--threshold", type=int,
+                      help="per-pixel difference counted as changed, 0-255 (default: 32)")
+    diff.add_argument("--maps", metavar="DIR",
+                      help="also write the difference map of every changed image to DIR/<sample>/<tag>.png")
+    diff.set_defaults(func=cmd_diff)
+
+    metrics = commands.add_parser("metrics", help="write SSIM / PSNR against a reference sample to an xlsx file")
+    add_common(metrics)
+    metrics.add_argument("--reference", required=True, help="name of the reference sample directory")
+    metrics.add_argument("-o", "--output", required=True, help="output .xlsx file")
+    metrics.set_defaults(func=cmd_metrics)
+
+    outliers = commands.add_parser("outliers", help="images that differ most from the other samples of their tag")
+    add_common(outliers)
+    add_index(outliers)
+    outliers.add_argument("--top", type=int, default=50, help="number of outliers to list (default: %(default)s)")
+    outliers.add_argument("--min-distance", type=int, default=1,
+                          help="smallest Hamming distance to the tag majority listed (default: %(default)s)")
+    outliers.set_defaults(func=cmd_outliers)
+
+    duplicates = commands.add_parser("duplicates", help="near-duplicate images across tags")
+    add_common(duplicates)
+    add_index(duplicates)
+    duplicates.add_argument("--distance", type=int, default=3,
+                            help=f"largest Hamming distance between the 64 bit hashes, at most {MAX_DUPLICATE_DISTANCE} "
+                                 "(default: %(default)s); pairs among many near-identical images may be missed")
+    duplicates.add_argument("--same-tag", action="store_true", help="also report pairs within one tag")
+    duplicates.add_argument("--limit", type=int, default=1000, help="number of pairs to list (default: %(default)s)")
+    duplicates.set_defaults(func=cmd_duplicates)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"Not a folder: {args.folder}")
+        return 1
+    if getattr(args, "cache_mb", None):
+        # Read by every process that opens the cache, including the decoding workers
+        os.environ[MAX_MB_ENV] = str(args.cache_mb)
+    try:
+        return args.func(args)
+    finally:
+        shutdown_pools()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -4,7 +4,6 @@ import json
 import hashlib
 import platform
 from pathlib import Path
-from valid_key_hashes import VALID_KEY_HASHES
 
 APP_NAME = "Inspecto"
 LICENSE_FILE = os.path.join(os.getenv("APPDATA") or str(Path.home()), APP_NAME, "license.json")
@@ -51,6 +50,7 @@ def machine_fingerprint() -> str:
 
 def verify_key_offline(key: str) -> bool:
     """Check if key hash exists in the valid keys list (offline)."""
+    from valid_key_hashes import VALID_KEY_HASHES  # 1000 entries, loaded on first check
     return sha256_hex(key.strip()) in VALID_KEY_HASHES
 
 
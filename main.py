@@ -1,99 +1,260 @@
 import sys
 import os
-import subprocess
+import time
+STARTUP_T0 = time.perf_counter()  # --profile-startup counts from here, before the imports below
+import multiprocessing
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QPushButton, QLabel, QFileDialog, QVBoxLayout,
-    QHBoxLayout, QGridLayout, QScrollArea, QProgressBar, QMessageBox, QSpinBox, 
-    QSizePolicy, QProgressDialog, QComboBox, QInputDialog, QTabWidget
+    QHBoxLayout, QProgressBar, QMessageBox, QSpinBox, 
+    QSizePolicy, QProgressDialog, QComboBox, QInputDialog, QTabWidget, QCheckBox
 )
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QPixmap, QIcon, QPalette, QColor
-from PIL import Image
-from io import BytesIO
-from pptx import Presentation
-from pptx.util import Inches, Pt
-from pptx.dml.color import RGBColor
-from io import BytesIO
+from PyQt6.QtCore import Qt, QEvent, QObject, QThread, QTimer, pyqtSignal
+from PyQt6.QtGui import QIcon, QPalette, QColor
 import license_manager
+from folder_index import FolderIndex, stale_dirs
+from folder_view import FolderGridView
+from folder_watch import FolderWatcher
+from image_store import DEFAULT_BUDGET_MB, ImageStore
+from media_cache import EncodedMediaCache
+from pptx_export import EXPORT_FORMATS, EXPORT_RESOLUTIONS, export_pptx
+from phash_index import PHashIndex
+from pipeline import load_folder, refresh_folder, rerender_folder
+from scanner import FolderState
+from tile_viewer import CompareViewer, TileCache, TileViewer
+from thumbnails import DECODE_QUALITIES, DEFAULT_QUALITY
+from worker_pool import Cancelled, default_workers, shutdown_pools
+
+STREAM_INTERVAL = 0.1  # seconds between tags_loaded batches
+CANCEL_TIMEOUT_MS = 2000  # how long the GUI waits for a cancelled loader
+OUTLIER_COUNT = 50  # entries in the outlier list
+# Imported on first use; --profile-startup reports any that sneak back into startup
+DEFERRED_MODULES = ("PIL", "numpy", "pptx", "xlsxwriter", "valid_key_hashes")
+REFLOW_DELAY_MS = 200  # column / width spin boxes settle this long before the view reflows
+
+
+class StartupProfile(QObject):
+    """--profile-startup: times each startup step and quits once the main window has painted."""
+
+    def __init__(self):
+        super().__init__()
+        self.marks = [("imports", time.perf_counter())]
+        self.loaded = []
+
+    def mark(self, step):
+        self.marks.append((step, time.perf_counter()))
+
+    def watch(self, window):
+        window.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            self.mark("first paint")
+            self.loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+            # Work queued for after the first frame (license check) runs before this
+            QTimer.singleShot(0, self.finish)
+        return False
+
+    def finish(self):
+        self.mark("deferred work")
+        print("Startup profile (ms, step / since main.py started):")
+        previous = STARTUP_T0
+        for step, t in self.marks:
+            print(f"  {step:<14} {(t - previous) * 1000:8.1f} {(t - STARTUP_T0) * 1000:8.1f}")
+            previous = t
+        first_paint = dict(self.marks)["first paint"]
+        print(f"Time to first window: {(first_paint - STARTUP_T0) * 1000:.0f} ms")
+        print(f"Deferred modules loaded before it: {', '.join(self.loaded) or 'none'}")
+        QApplication.quit()
+
 
 class ImageLoaderThread(QThread):
     progress_changed = pyqtSignal(int, int, str)  # current, total, tag
-    finished_loading = pyqtSignal(list, dict, dict, dict)  # samples, tag_map, loaded_images_pixmap, loaded_images_pil
-
-    def __init__(self, base_path, max_width=350):
+    # samples, tag_map, whether the thumbnail sizes are known (before decoding starts)
+    samples_found = pyqtSignal(list, dict, bool)
+    tags_loaded = pyqtSignal(list)  # tags whose thumbnails are in the store, in sorted order
+    finished_loading = pyqtSignal(list, dict)  # samples, tag_map
+    loading_cancelled = pyqtSignal(float)  # seconds between cancel() and the thread stopping work
+
+    def __init__(self, base_path, store, max_width=350, workers=None, quality=DEFAULT_QUALITY, hash_index=None,
+                 folder_index=None):
         super().__init__()
         self.base_path = base_path
+        self.store = store
+        self.hash_index = hash_index
+        self.folder_index = folder_index
+        self.dirs = {}  # directory listing for watch mode, see scanner.FolderState
+        self.stale_dirs = []  # directories that changed since the folder index was saved
         self.max_width = max_width
+        self.quality = quality
+        self.workers = workers or default_workers()
+        self._cancel_event = threading.Event()
+        self._cancel_requested_at = None
+        self.cancel_latency = None
+
+    def cancel(self):
+        """Ask the loader to stop; safe to call from any thread."""
+        if not self._cancel_event.is_set():
+            self._cancel_requested_at = time.perf_counter()
+            self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _stop_cancelled(self):
+        self.cancel_latency = time.perf_counter() - self._cancel_requested_at
+        print(f"Loading cancelled, stopped after {self.cancel_latency * 1000:.0f} ms")
+        self.loading_cancelled.emit(self.cancel_latency)
+
+    def run(self):
+        self._batch = []
+        self._last_flush = 0.0
+        try:
+            samples, tag_map, scan_stats = load_folder(self.base_path, self.store, self.max_width, self.quality,
+                                                       self.workers, self.is_cancelled,
+                                                       self.samples_found.emit, self._tag_done, self.hash_index,
+                                                       self.dirs, self.folder_index)
+        except Cancelled:
+            self._stop_cancelled()
+            return
+        if self.is_cancelled():
+            self._stop_cancelled()
+            return
+        if scan_stats.get("indexed"):
+            self.stale_dirs = stale_dirs(self.dirs)
+
+        self.finished_loading.emit(samples, tag_map)
+
+    def _tag_done(self, done_tags, total_tags, tag):
+        self.progress_changed.emit(done_tags, total_tags, tag)
+        # Stream finished tags to the view: the first one right away,
+        # then batched so the GUI thread is not flooded with signals
+        self._batch.append(tag)
+        now = time.perf_counter()
+        if now - self._last_flush >= STREAM_INTERVAL or done_tags == total_tags:
+            self.tags_loaded.emit(self._batch)
+            self._batch = []
+            self._last_flush = now
+
+
+class RefreshThread(QThread):
+    # changed tags, removed tags, new directories, sample list changed
+    refreshed = pyqtSignal(list, list, list, bool)
+
+    def __init__(self, state, paths, store, workers=None, hash_index=None, folder_index=None):
+        super().__init__()
+        self.state = state
+        self.paths = paths
+        self.store = store
+        self.workers = workers or default_workers()
+        self.hash_index = hash_index
+        self.folder_index = folder_index
+
+    def run(self):
+        t_start = time.perf_counter()
+        changed, removed, new_dirs, samples_changed = refresh_folder(self.state, self.paths, self.store,
+                                                                     self.workers, self.hash_index,
+                                                                     self.folder_index)
+        print(f"Refreshed {len(self.paths)} dirs ({len(changed)} tags changed, {len(removed)} removed) "
+              f"in {time.perf_counter() - t_start:.2f} s")
+        self.refreshed.emit(changed, removed, new_dirs, samples_changed)
+
+
+class RenderThread(QThread):
+    tags_rendered = pyqtSignal(list)  # tags whose thumbnails were replaced
+
+    def __init__(self, store, max_width, workers=None, first_tag=None):
+        super().__init__()
+        self.store = store
+        self.max_width = max_width
+        self.workers = workers or default_workers()
+        self.first_tag = first_tag
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        self._batch = []
+        self._last_flush = 0.0
+        try:
+            rerender_folder(self.store, self.max_width, self.workers, self.first_tag,
+                            self._cancel_event.is_set, self._tag_done)
+        except Cancelled:
+            return
+        if self._batch:
+            self.tags_rendered.emit(self._batch)
+
+    def _tag_done(self, tag):
+        self._batch.append(tag)
+        now = time.perf_counter()
+        if now - self._last_flush >= STREAM_INTERVAL:
+            self.tags_rendered.emit(self._batch)
+            self._batch = []
+            self._last_flush = now
+
+
+class ExportThread(QThread):
+    progress_changed = pyqtSignal(int, int, str)  # current, total, tag
+    export_finished = pyqtSignal(str)  # filename
+    export_failed = pyqtSignal(str)  # error message
+
+    def __init__(self, filename, store, max_columns, workers=None, media_cache=None, image_format="auto",
+                 resolution=0):
+        super().__init__()
+        self.filename = filename
+        self.store = store
+        self.max_columns = max_columns
+        self.workers = workers or default_workers()
+        self.media_cache = media_cache
+        self.image_format = image_format
+        self.resolution = resolution
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            export_pptx(self.filename, self.store.tags(), self.store.samples, self.store.get_pil,
+                        self.max_columns, self.workers,
+                        progress=self.progress_changed.emit, should_stop=self._cancel_event.is_set,
+                        media_cache=self.media_cache, image_format=self.image_format,
+                        image_path=self.store.path, resolution=self.resolution)
+        except Exception as e:
+            self.export_failed.emit(str(e))
+            return
+        self.export_finished.emit(self.filename)
+
+
+class MetricsThread(QThread):
+    progress_changed = pyqtSignal(int, int, str)  # current, total, tag
+    metrics_finished = pyqtSignal(str, int)  # filename, scored pairs
+    metrics_failed = pyqtSignal(str)  # error message
+
+    def __init__(self, filename, store, reference, workers=None):
+        super().__init__()
+        self.filename = filename
+        self.store = store
+        self.reference = reference
+        self.workers = workers or default_workers()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
 
     def run(self):
-        samples = []
-        tag_map = {}
-
-        ed_sample_paths = []
-        for root, dirs, _ in os.walk(self.base_path):
-            for d in dirs:
-                if d.upper().startswith("ED"):
-                    ed_sample_paths.append(os.path.join(root, d))
-
-        samples = [os.path.basename(p) for p in ed_sample_paths]
-
-        for sample_path in ed_sample_paths:
-            sample = os.path.basename(sample_path)
-            for root, _, files in os.walk(sample_path):
-                for file in files:
-                    if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                        tag = file.lower()
-                        tag_map.setdefault(tag, {})[sample] = os.path.join(root, file)
-
-        tags = sorted(tag_map.keys())
-        total_tags = len(tags)
-
-        loaded_images_pixmap = {}
-        loaded_images_pil = {}
-
-        for i, tag in enumerate(tags, 1):
-            loaded_images_pixmap[tag] = {}
-            loaded_images_pil[tag] = {}
-            for sample in samples:
-                path = tag_map[tag].get(sample)
-                if path:
-                    pil_img = self.load_pil_image(path)
-                    pixmap = self.pil_to_pixmap(pil_img) if pil_img else None
-                    loaded_images_pixmap[tag][sample] = (pixmap, path)
-                    loaded_images_pil[tag][sample] = pil_img
-                else:
-                    loaded_images_pixmap[tag][sample] = (None, None)
-                    loaded_images_pil[tag][sample] = None
-            self.progress_changed.emit(i, total_tags, tag)
-
-        self.finished_loading.emit(samples, tag_map, loaded_images_pixmap, loaded_images_pil)
-
-    def load_pil_image(self, path):
+        from metrics import write_metrics_xlsx
         try:
-            img = Image.open(path)
-            wpercent = (self.max_width / float(img.size[0]))
-            height = int((float(img.size[1]) * float(wpercent)))
-            img = img.resize((self.max_width, height), Image.LANCZOS)
-            return img
+            pairs = write_metrics_xlsx(self.filename, self.store, self.reference, self.workers,
+                                       should_stop=self._cancel_event.is_set,
+                                       progress=self.progress_changed.emit)
         except Exception as e:
-            print(f"Error loading image {path}: {e}")
-            return None
-
-    def pil_to_pixmap(self, pil_img):
-        if pil_img is None:
-            return None
-        bio = BytesIO()
-        pil_img.save(bio, format='PNG')
-        bio.seek(0)
-        pixmap = QPixmap()
-        pixmap.loadFromData(bio.read())
-        return pixmap
-
-class ClickableLabel(QLabel):
-    clicked = pyqtSignal()
-    def mousePressEvent(self, event):
-        self.clicked.emit()
-        super().mousePressEvent(event)
+            self.metrics_failed.emit(str(e))
+            return
+        self.metrics_finished.emit(self.filename, pairs)
+
 
 class InspectoApp(QWidget):
     def __init__(self):
@@ -112,6 +273,22 @@ class InspectoApp(QWidget):
         self.tabs = QTabWidget()
         self.main_layout.addWidget(self.tabs)
 
+        # Thumbnails of the loaded folder, shared by the view and the export
+        self.image_store = ImageStore()
+        # Encoded export images, reused by every export in this session
+        self.media_cache = EncodedMediaCache()
+        # Perceptual hashes of the loaded images, for the outlier list
+        self.hash_index = PHashIndex()
+        # Watch mode: directory listing of the loaded folder and pending changes
+        self.folder_state = None
+        self.folder_index = None
+        # Full resolution tiles shared by the image and compare viewers
+        self.tile_cache = TileCache()
+        self.folder_watcher = FolderWatcher(self)
+        self.folder_watcher.dirs_changed.connect(self.on_dirs_changed)
+        self.refresh_thread = None
+        self._pending_dirs = set()
+
         # --- Controls layout for folder tab ---
         self.controls_layout = QHBoxLayout()
         self.folder_label = QLabel("Select folder:")
@@ -119,6 +296,9 @@ class InspectoApp(QWidget):
         self.load_button = QPushButton("Load")
         self.clear_button = QPushButton("Clear")
         self.clear_button.setEnabled(False)
+        self.watch_checkbox = QCheckBox("Watch")
+        self.watch_checkbox.setToolTip("Update the view when images in the loaded folder are added, changed or removed")
+        self.watch_checkbox.toggled.connect(self.on_watch_toggled)
 
         self.max_columns_label = QLabel("Max columns:")
         self.max_columns_label.setFixedWidth(75)
@@ -134,9 +314,50 @@ class InspectoApp(QWidget):
         self.img_width_spin.setValue(350)
         self.img_width_spin.setFixedWidth(60)
 
+        self.workers_label = QLabel("Workers:")
+        self.workers_label.setFixedWidth(55)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, (os.cpu_count() or 1) * 2))
+        self.workers_spin.setValue(default_workers())
+        self.workers_spin.setFixedWidth(50)
+        self.workers_spin.setToolTip("Number of processes used for decoding images")
+
+        self.memory_label = QLabel("RAM (MB):")
+        self.memory_label.setFixedWidth(65)
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(64, 65536)
+        self.memory_spin.setSingleStep(64)
+        self.memory_spin.setValue(DEFAULT_BUDGET_MB)
+        self.memory_spin.setFixedWidth(70)
+        self.memory_spin.setToolTip("Memory budget for thumbnails; older ones are reloaded from the disk cache on demand")
+        self.memory_spin.valueChanged.connect(self.image_store.set_budget_mb)
+
+        self.quality_combo = QComboBox()
+        self.quality_combo.addItems([q.capitalize() for q in DECODE_QUALITIES])
+        self.quality_combo.setCurrentIndex(DECODE_QUALITIES.index(DEFAULT_QUALITY))
+        self.quality_combo.setFixedWidth(85)
+        self.quality_combo.setToolTip("Decode quality: Best = full decode, Fast = decoder downscaling only")
+
+        self.export_format_combo = QComboBox()
+        self.export_format_combo.addItems(["Auto", "PNG", "JPEG", "Original"])
+        self.export_format_combo.setFixedWidth(80)
+        self.export_format_combo.setToolTip("Image format in the exported deck; Auto picks PNG or JPEG per image, "
+                                            "Original embeds the source files at full resolution")
+
+        self.export_resolution_combo = QComboBox()
+        self.export_resolution_combo.addItems(["Thumbnails"] + [f"{px} px" for px in EXPORT_RESOLUTIONS[1:]])
+        self.export_resolution_combo.setFixedWidth(95)
+        self.export_resolution_combo.setToolTip("Slide width the exported images are rendered for from the originals; "
+                                                "Thumbnails reuses the images shown in the Folder View")
+
+        self.reference_combo = QComboBox()
+        self.reference_combo.setFixedWidth(120)
+        self.reference_combo.setToolTip("Reference sample for the SSIM / PSNR metrics")
+        self.metrics_button = QPushButton("Metrics to Excel")
+        self.metrics_button.setEnabled(False)
+        self.metrics_button.clicked.connect(self.export_metrics)
+
         self.export_pdf_button = QPushButton("Export to PowerPoint")
-        if not license_manager.is_pro():
-            self.export_pdf_button.setToolTip("Pro feature – activate license to enable Export")
 
         # Tag selection and jump
         self.tag_combo = QComboBox()
@@ -144,19 +365,43 @@ class InspectoApp(QWidget):
         self.jump_button = QPushButton("Skip to tag")
         self.jump_button.setEnabled(False)
         self.jump_button.clicked.connect(self.scroll_to_tag)
+        self.compare_button = QPushButton("Compare")
+        self.compare_button.setToolTip("All samples of the selected tag side by side, zoomed and panned together")
+        self.compare_button.setEnabled(False)
+        self.compare_button.clicked.connect(self.open_compare)
+
+        # Images that differ most from the other samples of their tag
+        self.outlier_combo = QComboBox()
+        self.outlier_combo.setFixedWidth(220)
+        self.outlier_combo.setPlaceholderText("Outliers")
+        self.outlier_combo.setToolTip("Images that look most unlike the other samples of their tag; select one to jump to it")
+        self.outlier_combo.setEnabled(False)
+        self.outlier_combo.activated.connect(self.jump_to_outlier)
 
         # Add widgets to controls layout
         self.controls_layout.addWidget(self.folder_label)
         self.controls_layout.addWidget(self.select_button)
         self.controls_layout.addWidget(self.load_button)
         self.controls_layout.addWidget(self.clear_button)
+        self.controls_layout.addWidget(self.watch_checkbox)
         self.controls_layout.addStretch()
         self.controls_layout.addWidget(self.max_columns_label)
         self.controls_layout.addWidget(self.max_columns_spin)
         self.controls_layout.addWidget(self.img_width_label)
         self.controls_layout.addWidget(self.img_width_spin)
+        self.controls_layout.addWidget(self.workers_label)
+        self.controls_layout.addWidget(self.workers_spin)
+        self.controls_layout.addWidget(self.quality_combo)
+        self.controls_layout.addWidget(self.memory_label)
+        self.controls_layout.addWidget(self.memory_spin)
         self.controls_layout.addWidget(self.tag_combo)
         self.controls_layout.addWidget(self.jump_button)
+        self.controls_layout.addWidget(self.compare_button)
+        self.controls_layout.addWidget(self.outlier_combo)
+        self.controls_layout.addWidget(self.reference_combo)
+        self.controls_layout.addWidget(self.metrics_button)
+        self.controls_layout.addWidget(self.export_format_combo)
+        self.controls_layout.addWidget(self.export_resolution_combo)
         self.controls_layout.addWidget(self.export_pdf_button)
 
         self.activate_button = QPushButton("Activate Pro")
@@ -166,7 +411,8 @@ class InspectoApp(QWidget):
         # Subscription status
         self.pro_status_label = QLabel("")
         self.controls_layout.addWidget(self.pro_status_label)
-        self.update_pro_status()
+        # Reading the license and the key list waits until the window is up
+        QTimer.singleShot(0, self.update_pro_status)
 
         # --- Folder tab ---
         self.folder_tab = QWidget()
@@ -181,15 +427,10 @@ class InspectoApp(QWidget):
         self.folder_tab_layout.addWidget(self.progress_bar)
         self.folder_tab_layout.addWidget(self.status_label)
 
-        # Scroll area for images
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.images_widget = QWidget()
-        self.grid_layout = QGridLayout(self.images_widget)
-        self.grid_layout.setContentsMargins(5, 5, 5, 5)
-        self.grid_layout.setSpacing(10)
-        self.scroll_area.setWidget(self.images_widget)
-        self.folder_tab_layout.addWidget(self.scroll_area)
+        # Virtualized view of all tag blocks
+        self.folder_view = FolderGridView(self.image_store)
+        self.folder_view.image_clicked.connect(self.open_viewer)
+        self.folder_tab_layout.addWidget(self.folder_view)
 
         # Scrollbar styling
         scroll_style = """
@@ -203,7 +444,7 @@ class InspectoApp(QWidget):
             background: #353535;
         }
         """
-        self.scroll_area.setStyleSheet(scroll_style)
+        self.folder_view.setStyleSheet(scroll_style)
 
         # Add folder tab to tabs
         self.tabs.addTab(self.folder_tab, "Folder View")
@@ -215,12 +456,8 @@ class InspectoApp(QWidget):
         from custom_tab import CustomImageGrid
         self.custom_grid = CustomImageGrid()
         self.custom_grid.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-
-        # --- Wrap grid in scroll area with dynamic stretch ---
-        self.custom_scroll = QScrollArea()
-        self.custom_scroll.setWidgetResizable(True)
-        self.custom_scroll.setWidget(self.custom_grid)
-        self.custom_tab_layout.addWidget(self.custom_scroll)
+        # The grid scrolls itself, only the cells in view exist as widgets
+        self.custom_tab_layout.addWidget(self.custom_grid)
 
         # Top controls layout for custom tab
         self.custom_controls_layout = QHBoxLayout()
@@ -238,6 +475,7 @@ class InspectoApp(QWidget):
 
         # Connect signal for dropped images
         self.custom_grid.images_dropped.connect(self.on_custom_images_loaded)
+        self.custom_grid.progress_changed.connect(self.on_custom_progress)
         self.custom_clear_button.clicked.connect(self.clear_custom_images)  # ✅ NEW CONNECTION
 
         # Add custom tab to tabs
@@ -245,9 +483,14 @@ class InspectoApp(QWidget):
 
         # --- Internal state ---
         self.selected_folder = None
-        self.tag_widgets = {}
         self.image_loader_thread = None
-        self.loaded_images_pil_cache = {}
+        self._stopping_loaders = []
+        self._load_pending = False
+        self._tags_shown = False  # the loader laid out all tags up front
+        self.render_thread = None
+        self._render_pending = False
+        self.export_thread = None
+        self.metrics_thread = None
 
         # --- Signals for folder tab ---
         self.select_button.clicked.connect(self.select_folder)
@@ -255,6 +498,14 @@ class InspectoApp(QWidget):
         self.clear_button.clicked.connect(self.clear_images)
         self.export_pdf_button.clicked.connect(self.on_export_clicked)
 
+        # Column count and image width apply to the loaded view right away
+        self.reflow_timer = QTimer(self)
+        self.reflow_timer.setSingleShot(True)
+        self.reflow_timer.setInterval(REFLOW_DELAY_MS)
+        self.reflow_timer.timeout.connect(self.apply_view_layout)
+        self.max_columns_spin.valueChanged.connect(lambda _: self.reflow_timer.start())
+        self.img_width_spin.valueChanged.connect(lambda _: self.reflow_timer.start())
+
 
     def clear_custom_images(self):
         """Clears all custom images from the custom grid."""
@@ -268,13 +519,14 @@ class InspectoApp(QWidget):
         if license_manager.is_pro():
             self.pro_status_label.setText("Status: Pro ✅")
             self.pro_status_label.setStyleSheet("color: green; font-weight: bold;")
+            self.export_pdf_button.setToolTip("")
         else:
             self.pro_status_label.setText("Status: Free 🔒")
             self.pro_status_label.setStyleSheet("color: red; font-weight: bold;")
+            self.export_pdf_button.setToolTip("Pro feature – activate license to enable Export")
 
     def unlock_pro_features(self):
         self.export_pdf_button.setEnabled(True)
-        self.export_pdf_button.setToolTip("")  # clear tooltip
         self.update_pro_status()
         QMessageBox.information(self, "Pro Unlocked", "All Pro features are now available.")
 
@@ -314,7 +566,7 @@ class InspectoApp(QWidget):
             QMessageBox.warning(self, "Pro Feature", "Export to PowerPoint is a Pro feature. Please activate your license.")
             return
 
-        if not self.loaded_images_pil_cache:
+        if not self.image_store.tag_map:
             QMessageBox.warning(self, "No images", "Please load images before exporting.")
             return
 
@@ -324,178 +576,354 @@ class InspectoApp(QWidget):
     def select_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select folder", "")
         if folder:
+            if folder != self.selected_folder and self.cancel_loading():
+                self.status_label.setText("Loading cancelled.")
+                self.status_label.show()
             self.selected_folder = folder
             self.folder_label.setText(f"Folder: {folder}    ")
 
+    def cancel_loading(self, timeout_ms=CANCEL_TIMEOUT_MS):
+        """
+        Stop the running loader and drop its partial results.
+        Returns True if a load was running. Signals still queued from the
+        old thread are ignored because it is no longer the current loader.
+        A loader that does not stop in time keeps writing to the store, so
+        the store is only reset (and the next load started) once it stopped.
+        """
+        thread = self.image_loader_thread
+        if thread is None or not thread.isRunning():
+            return False
+        self.image_loader_thread = None
+        thread.cancel()
+        if not thread.wait(timeout_ms):
+            # Keep a reference so the QThread is not destroyed while running
+            print(f"Loader did not stop within {timeout_ms} ms, leaving it to finish in the background")
+            self._stopping_loaders.append(thread)
+            thread.finished.connect(self.on_loader_stopped)
+
+        self.folder_view.clear()
+        self.tag_combo.clear()
+        self.reference_combo.clear()
+        self.outlier_combo.clear()
+        self.outlier_combo.setEnabled(False)
+        self.reset_data()
+        self.progress_bar.setValue(0)
+        self.progress_bar.hide()
+        self.load_button.setText("Load")
+        self.clear_button.setEnabled(False)
+        self.jump_button.setEnabled(False)
+        self.compare_button.setEnabled(False)
+        return True
+
+    def reset_data(self):
+        """Empty the store and hash index, unless a cancelled loader still writes to them."""
+        if not self._stopping_loaders:
+            self.image_store.reset()
+            self.hash_index.reset()
+
+    def on_loader_stopped(self):
+        self._stopping_loaders.remove(self.sender())
+        if self._stopping_loaders:
+            return
+        self.image_store.reset()
+        self.hash_index.reset()
+        if self._load_pending:
+            self._load_pending = False
+            self.load_images()
+
+    def on_loading_cancelled(self, latency):
+        # Restarted loads report their own progress
+        if self.image_loader_thread is None:
+            self.status_label.setText(f"Loading cancelled, stopped in {latency * 1000:.0f} ms.")
+
+    def _is_current_loader(self):
+        return self.image_loader_thread is not None and self.sender() is self.image_loader_thread
+
+    def closeEvent(self, event):
+        for viewer in self.findChildren(TileViewer) + self.findChildren(CompareViewer):
+            viewer.close()
+        self.tile_cache.stop()
+        self.custom_grid.stop()
+        self.folder_view.stop()
+        self.stop_watching()
+        self.cancel_render()
+        self.cancel_loading()
+        for thread in self._stopping_loaders:
+            thread.wait()
+        for thread in (self.export_thread, self.metrics_thread):
+            if thread is not None and thread.isRunning():
+                thread.cancel()
+                thread.wait()
+        super().closeEvent(event)
+
     def load_images(self):
         self.setFocus()
         if not self.selected_folder or not os.path.isdir(self.selected_folder):
             QMessageBox.warning(self, "Failure", "Incorrect path to folder.")
             return
 
+        # Pressing Load again restarts with the current folder and settings
+        self.stop_watching()
+        self.cancel_render()
+        self.cancel_loading()
+
         self.progress_bar.setValue(0)
         self.progress_bar.show()
         self.status_label.show()
+        if self._stopping_loaders:
+            # on_loader_stopped() starts the load
+            self._load_pending = True
+            self.status_label.setText("Waiting for the previous load to stop...")
+            self.clear_button.setEnabled(True)
+            return
         self.status_label.setText("Reading data and images...")
-        self.load_button.setEnabled(False)
-        self.clear_button.setEnabled(False)
+        self.load_button.setText("Restart")
+        self.clear_button.setEnabled(True)
         self.export_pdf_button.setEnabled(False)
+        self.metrics_button.setEnabled(False)
 
         max_width = self.img_width_spin.value()
-        self.image_loader_thread = ImageLoaderThread(self.selected_folder, max_width)
+        workers = self.workers_spin.value()
+        quality = DECODE_QUALITIES[self.quality_combo.currentIndex()]
+        self.folder_index = FolderIndex(self.selected_folder)
+        self.image_loader_thread = ImageLoaderThread(self.selected_folder, self.image_store, max_width, workers, quality,
+                                                     self.hash_index, self.folder_index)
         self.image_loader_thread.progress_changed.connect(self.on_progress_changed)
+        self.image_loader_thread.samples_found.connect(self.on_samples_found)
+        self.image_loader_thread.tags_loaded.connect(self.on_tags_loaded)
         self.image_loader_thread.finished_loading.connect(self.on_finished_loading)
+        self.image_loader_thread.loading_cancelled.connect(self.on_loading_cancelled)
         self.image_loader_thread.start()
 
     def on_progress_changed(self, current, total, tag):
+        if not self._is_current_loader():
+            return
         percent = int(current / total * 100)
         self.progress_bar.setValue(percent)
         self.status_label.setText(f"Reading tag: {tag} ({current}/{total})")
 
-    def on_finished_loading(self, samples, tag_map, loaded_images_pixmap, loaded_images_pil):
-        self.status_label.setText("Reading done, building view...")
+    def on_samples_found(self, samples, tag_map, sized):
+        if not self._is_current_loader():
+            return
+        self.tag_combo.clear()
+        self.outlier_combo.clear()
+        self.outlier_combo.setEnabled(False)
+        self.reference_combo.clear()
+        self.reference_combo.addItems(samples)
+        self.jump_button.setEnabled(False)
+        self.compare_button.setEnabled(False)
+        self.folder_view.set_samples(samples, self.max_columns_spin.value(), self.img_width_spin.value())
+        self.status_label.setText(f"Found {len(samples)} samples and {len(tag_map)} tags, reading images...")
+        # Thumbnail sizes from the folder index: lay out every tag now, the
+        # visible ones are decoded on demand while the loader catches up
+        self._tags_shown = sized
+        if sized:
+            tags = self.image_store.tags()
+            self.folder_view.append_tags(tags)
+            self.tag_combo.addItems(tags)
+            self.jump_button.setEnabled(True)
+            self.compare_button.setEnabled(True)
+
+    def on_tags_loaded(self, tags):
+        # Tags stream in while the loader is still decoding
+        if not self._is_current_loader():
+            return
+        if self._tags_shown:
+            self.folder_view.refresh_tags(tags)
+            return
+        self.folder_view.append_tags(tags)
+        self.tag_combo.addItems(tags)
+        self.jump_button.setEnabled(True)
+        self.compare_button.setEnabled(True)
+
+    def on_finished_loading(self, samples, tag_map):
+        # The view was filled by on_tags_loaded already
+        if not self._is_current_loader():
+            return
+        self.load_button.setText("Load")
         self.progress_bar.setValue(0)
         self.progress_bar.hide()
         self.status_label.hide()
 
-        while self.grid_layout.count():
-            item = self.grid_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-
-        self.tag_widgets.clear()
-        self.tag_combo.clear()
-
-        max_columns = self.max_columns_spin.value()
-
-        row = 0
-        for idx, tag in enumerate(sorted(tag_map.keys())):
-            tag_container = QWidget()
-            tag_layout = QGridLayout(tag_container)
-            tag_layout.setContentsMargins(10,10,10,10)
-            tag_layout.setSpacing(10)
-
-            tag_container.setStyleSheet("background-color: #ADD8E6;")
-
-            tag_label = QLabel(f"tag: {tag}")
-            tag_label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-            tag_label.setStyleSheet("""
-                font-weight: bold;
-                color: black;
-                font-size: 20px;
-                background-color: #e0eaff;
-                padding: 5px;
-            """)
-            tag_layout.addWidget(tag_label, 0, 0, 1, max_columns)
-
-            col = 0
-            tag_row = 1
-            for sample in samples:
-                pixmap, path = loaded_images_pixmap[tag].get(sample, (None, None))
-
-                container = QWidget()
-                container_layout = QVBoxLayout(container)
-                container_layout.setContentsMargins(0,0,0,0)
-                container_layout.setSpacing(0)
-                container_layout.setAlignment(Qt.AlignmentFlag.AlignHCenter)
-                container.setStyleSheet("border: 1px solid black;")
-
-                if pixmap:
-                    img_label = ClickableLabel()
-                    img_label.setPixmap(pixmap)
-                    img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                    img_label.setFixedWidth(pixmap.width())
-                    img_label.clicked.connect(lambda checked=False, p=path: self.open_external_viewer(p))
-                else:
-                    placeholder_width = self.img_width_spin.value()
-                    placeholder_height = 100
-                    img_label = QLabel("No image")
-                    img_label.setFixedSize(placeholder_width, placeholder_height)
-                    img_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-                img_label.setStyleSheet("""
-                    QLabel {
-                        border: 2px solid black;
-                        border-radius: 5px;
-                        transition: all 0.2s ease;
-                    }
-                    QLabel:hover {
-                        border: 2px solid red;
-                        background-color: rgba(42, 130, 218, 0.1);
-                    }
-                """)
-
-                sample_label = QLabel(sample)
-                sample_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                sample_label.setStyleSheet("color: black; font-size: 18px; border: 2px solid black; background-color: white;")
-                sample_label.setSizePolicy(QSizePolicy.Policy.Preferred, QSizePolicy.Policy.Fixed)
-
-                container_layout.addWidget(img_label)
-                container_layout.addWidget(sample_label)
-
-                tag_layout.addWidget(container, tag_row, col)
-
-                col += 1
-                if col >= max_columns:
-                    col = 0
-                    tag_row += 1
-
-            self.grid_layout.addWidget(tag_container, row, 0)
-            self.tag_widgets[tag] = tag_container
-            self.tag_combo.addItem(tag)
-            row += 1
-
-        if self.tag_widgets:
-            self.jump_button.setEnabled(True)
-
         self.clear_button.setEnabled(True)
         self.load_button.setEnabled(True)
         self.export_pdf_button.setEnabled(True)
-        self.loaded_images_pil_cache = loaded_images_pil
+        self.metrics_button.setEnabled(self.reference_combo.count() > 1)
+        self.update_outliers()
+
+        self.folder_state = FolderState(samples, self.sender().dirs)
+        if self.watch_checkbox.isChecked():
+            self.watch_dirs(list(self.folder_state.dirs))
+        # Opened from the folder index: list the directories that changed since
+        self._pending_dirs.update(self.sender().stale_dirs)
+        self.start_refresh()
+        # The image width was raised while loading
+        self.start_render()
 
     def clear_images(self):
         self.setFocus()
-        while self.grid_layout.count():
-            item = self.grid_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
+        self.stop_watching()
+        self.cancel_render()
+        self.cancel_loading()
+        self._load_pending = False
+        self.reset_data()
+        self.folder_view.clear()
         self.status_label.setText("")
         self.progress_bar.setValue(0)
         self.clear_button.setEnabled(False)
         self.export_pdf_button.setEnabled(False)
+        self.metrics_button.setEnabled(False)
         self.jump_button.setEnabled(False)
+        self.compare_button.setEnabled(False)
         self.tag_combo.clear()
-        self.tag_widgets.clear()
-        
+        self.reference_combo.clear()
+        self.outlier_combo.clear()
+        self.outlier_combo.setEnabled(False)
 
-    def open_external_viewer(self, filepath):
+
+    # --- Live column / width changes ---
+    def apply_view_layout(self):
+        self.folder_view.set_layout(self.max_columns_spin.value(), self.img_width_spin.value())
+        self.start_render()
+
+    def start_render(self):
+        """
+        Thumbnails are decoded at the width of the Load; wider views show them
+        scaled up until they are decoded again at the new width in the background.
+        Narrower views only scale down.
+        """
+        width = self.folder_view.img_width
+        if not self.image_store.tag_map or (width <= self.image_store.max_width and not self._render_pending):
+            return
+        # Images decoded from now on (by the loader too) use the new width
+        self.image_store.set_max_width(max(width, self.image_store.max_width))
+        if self.image_loader_thread is not None and self.image_loader_thread.isRunning():
+            self._render_pending = True  # on_finished_loading starts it
+            return
+        self._render_pending = False
+        self.cancel_render()
+        self.render_thread = RenderThread(self.image_store, self.image_store.max_width,
+                                          self.workers_spin.value(), self.folder_view.top_tag())
+        self.render_thread.tags_rendered.connect(self.on_tags_rendered)
+        self.render_thread.start()
+
+    def cancel_render(self):
+        self._render_pending = False
+        if self.render_thread is not None and self.render_thread.isRunning():
+            self.render_thread.cancel()
+            self.render_thread.wait()
+        self.render_thread = None
+
+    def on_tags_rendered(self, tags):
+        if self.sender() is self.render_thread:
+            self.folder_view.refresh_tags(tags)
+
+    # --- Watch mode ---
+    def on_watch_toggled(self, checked):
+        if not checked:
+            self.folder_watcher.stop()
+            self._pending_dirs.clear()
+        elif self.folder_state is not None and not self.folder_watcher.is_watching():
+            # Catch up with whatever changed while not watching
+            self._pending_dirs.update(self.folder_state.dirs)
+            self.watch_dirs(list(self.folder_state.dirs))
+            self.start_refresh()
+
+    def watch_dirs(self, dirs):
+        """Watch directories of the loaded folder and, for rewrites in place, the images listed in them."""
+        listing = self.folder_state.dirs
+        files = [os.path.join(path, name) for path in dirs if path in listing for name in listing[path][1]]
+        self.folder_watcher.watch(dirs, files)
+
+    def stop_watching(self):
+        """Forget the loaded folder's listing; a pending update finishes first."""
+        self.folder_watcher.stop()
+        self._pending_dirs.clear()
+        if self.refresh_thread is not None and self.refresh_thread.isRunning():
+            self.refresh_thread.wait()
+        self.refresh_thread = None
+        self.folder_state = None
+
+    def wait_for_refresh(self):
+        """Let a running watch mode update finish; it changes the tag map that exports read."""
+        if self.refresh_thread is not None and self.refresh_thread.isRunning():
+            self.refresh_thread.wait()
+
+    def on_dirs_changed(self, paths):
+        self._pending_dirs.update(paths)
+        self.start_refresh()
+
+    def start_refresh(self):
+        if not self._pending_dirs or self.folder_state is None:
+            return
+        # One update at a time, and never while the store is being read for an export
+        for thread in (self.refresh_thread, self.export_thread, self.metrics_thread):
+            if thread is not None and thread.isRunning():
+                return
+        paths = sorted(self._pending_dirs)
+        self._pending_dirs.clear()
+        self.refresh_thread = RefreshThread(self.folder_state, paths, self.image_store,
+                                            self.workers_spin.value(), self.hash_index, self.folder_index)
+        self.refresh_thread.refreshed.connect(self.on_refreshed)
+        self.refresh_thread.start()
+
+    def on_refreshed(self, changed, removed, new_dirs, samples_changed):
+        if self.sender() is not self.refresh_thread:
+            return
+        if self.watch_checkbox.isChecked():
+            self.watch_dirs(new_dirs)
+        if samples_changed:
+            self.folder_view.set_samples(self.image_store.samples, self.max_columns_spin.value(),
+                                         self.img_width_spin.value())
+            self.folder_view.append_tags(self.image_store.tags())
+            current = self.reference_combo.currentText()
+            self.reference_combo.clear()
+            self.reference_combo.addItems(self.image_store.samples)
+            self.reference_combo.setCurrentText(current)
+        else:
+            self.folder_view.patch_tags(changed, removed)
+        if removed or self.tag_combo.count() != len(self.folder_view.tags):
+            self.tag_combo.clear()
+            self.tag_combo.addItems(self.folder_view.tags)
+        self.update_outliers()
+        if changed or removed:
+            self.status_label.setText(f"Updated {len(changed)} tags, removed {len(removed)} tags.")
+            self.status_label.show()
+        self.start_refresh()
+
+    def open_viewer(self, filepath):
         if not filepath or not os.path.isfile(filepath):
             QMessageBox.warning(self, "Failure", "File doesn´t exist or is incorrect.")
             return
+        # Non-modal, so several originals can be open next to the app
+        viewer = TileViewer(os.path.normpath(filepath), self.tile_cache, self)
+        viewer.show()
 
-        normalized_path = os.path.normpath(filepath)
+    def open_compare(self):
+        tag = self.tag_combo.currentText()
+        if tag not in self.image_store.tag_map:
+            return
+        CompareViewer(self.image_store, tag, self.tile_cache, self).show()
 
-        try:
-            if sys.platform.startswith('win'):
-                os.startfile(normalized_path)
-            elif sys.platform.startswith('darwin'):
-                subprocess.run(['open', normalized_path])
-            else:
-                subprocess.run(['xdg-open', normalized_path])
-        except Exception as e:
-            QMessageBox.warning(self, "Failure", f"Unable to open file: {e}")
+    def update_outliers(self):
+        self.outlier_combo.clear()
+        for distance, tag, sample in self.hash_index.outliers(OUTLIER_COUNT):
+            self.outlier_combo.addItem(f"{tag} – {sample} ({distance} bits)", tag)
+        self.outlier_combo.setEnabled(self.outlier_combo.count() > 0)
+
+    def jump_to_outlier(self, index):
+        tag = self.outlier_combo.itemData(index)
+        if tag and self.folder_view.has_tag(tag):
+            self.folder_view.scroll_to_tag(tag)
 
     def scroll_to_tag(self):
         selected_tag = self.tag_combo.currentText()
-        if not selected_tag or selected_tag not in self.tag_widgets:
+        if not selected_tag or not self.folder_view.has_tag(selected_tag):
             return
-        widget = self.tag_widgets[selected_tag]
-        self.scroll_area.ensureWidgetVisible(widget)
+        self.folder_view.scroll_to_tag(selected_tag)
 
     def export_to_pptx(self):
-        if not self.loaded_images_pil_cache:
+        if not self.image_store.tag_map:
             QMessageBox.warning(self, "Failure", "No images to export.")
             return
 
@@ -503,144 +931,131 @@ class InspectoApp(QWidget):
         if not filename:
             return
 
-        prs = Presentation()
-        slide_width = prs.slide_width
-        slide_height = prs.slide_height
-
-        margin = Inches(0.5)
-        padding = Inches(0.2)
-        header_height = Inches(0.7)
-
-        usable_width = slide_width - 2 * margin
-        usable_height = slide_height - 2 * margin - header_height
-
-        max_columns = self.max_columns_spin.value()
-        img_width = (usable_width - (max_columns - 1) * padding) / max_columns
-
-        tags = sorted(self.loaded_images_pil_cache.keys())
-
-        progress = QProgressDialog("Exporting to PowerPoint...", "Cancel", 0, len(tags), self)
-        progress.setWindowTitle("Export PowerPoint")
-        progress.setWindowModality(Qt.WindowModality.ApplicationModal)
-        progress.setMinimumDuration(0)
-
-        for i, tag in enumerate(tags):
-            if progress.wasCanceled():
-                break
-
-            slide = prs.slides.add_slide(prs.slide_layouts[6])  # prázdný slide
-
-
-            # Tag vlevo nahoře
-            header_height = Inches(0.4)
-            tag_box = slide.shapes.add_textbox(margin, margin, usable_width, header_height)
-
-            # Nastavení výplně na světle šedou (třeba RGB 220,220,220)
-            fill = tag_box.fill
-            fill.solid()
-            fill.fore_color.rgb = RGBColor(220, 220, 220)
-
-            # Nastavení černého rámečku
-            line = tag_box.line
-            line.color.rgb = RGBColor(0, 0, 0)
-            line.width = Pt(1)  # tloušťka rámečku
-
-            tf2 = tag_box.text_frame
-            p2 = tf2.paragraphs[0]
-            p2.alignment = 1  # zarovnání vlevo
-            run2 = p2.add_run()
-            run2.text = f"tag: {tag}"
-            font2 = run2.font
-            font2.size = Pt(16)
-            font2.bold = False
-            font2.color.rgb = RGBColor(0, 0, 0)
-
-
-            samples = list(self.loaded_images_pil_cache[tag].keys())
+        # Later updates are held back by start_refresh() until the export is done
+        self.wait_for_refresh()
+        tags = self.image_store.tags()
+        image_format = EXPORT_FORMATS[self.export_format_combo.currentIndex()]
+        resolution = EXPORT_RESOLUTIONS[self.export_resolution_combo.currentIndex()]
+        self.export_thread = ExportThread(filename, self.image_store, self.max_columns_spin.value(),
+                                          self.workers_spin.value(), self.media_cache, image_format,
+                                          resolution)
+
+        self.export_progress = QProgressDialog("Exporting to PowerPoint...", "Cancel", 0, len(tags), self)
+        self.export_progress.setWindowTitle("Export PowerPoint")
+        self.export_progress.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.canceled.connect(self.export_thread.cancel)
+
+        self.export_thread.progress_changed.connect(self.on_export_progress)
+        self.export_thread.export_finished.connect(self.on_export_finished)
+        self.export_thread.export_failed.connect(self.on_export_failed)
+
+        # The store must not be reset while the export reads from it
+        self.load_button.setEnabled(False)
+        self.clear_button.setEnabled(False)
+        self.export_pdf_button.setEnabled(False)
+        self.export_thread.start()
 
-            rows = (len(samples) + max_columns - 1) // max_columns
-            img_height = (usable_height - (rows - 1) * padding) / rows
+    def on_export_progress(self, current, total, tag):
+        self.export_progress.setValue(current)
+        self.export_progress.setLabelText(f"Exporting tag: {tag} ({current}/{total})")
 
-            col = 0
-            row = 0
-            
-            extra_top_padding = Inches(0.3)  # pevná mezera pod tagem
+    def _end_export(self):
+        self.export_progress.close()
+        self.load_button.setEnabled(True)
+        self.clear_button.setEnabled(True)
+        self.export_pdf_button.setEnabled(True)
+        self.start_refresh()
 
-            for sample in samples:
-                pil_img = self.loaded_images_pil_cache[tag][sample]
-                if pil_img is None:
-                    continue
+    def on_export_failed(self, message):
+        self._end_export()
+        QMessageBox.warning(self, "Failure", f"Unable to save PowerPoint: {message}")
 
-                w, h = pil_img.size
-                ratio = w / h
-                draw_width = img_width
-                draw_height = img_width / ratio
+    def on_export_finished(self, filename):
+        self._end_export()
+        try:
+            if sys.platform.startswith('win'):
+                os.startfile(filename)
+            else:
+                import subprocess
+                subprocess.run(['open' if sys.platform.startswith('darwin') else 'xdg-open', filename])
+        except Exception as e:
+            print(f"Unable to open PowerPoint: {e}")
 
-                if draw_height > img_height:
-                    draw_height = img_height
-                    draw_width = img_height * ratio
+        QMessageBox.information(self, "Done", f"PowerPoint slides saved to:\n{filename}")
 
-                x = margin + col * (img_width + padding)
-                y = margin + header_height + extra_top_padding + row * (img_height + padding)
+    def export_metrics(self):
+        reference = self.reference_combo.currentText()
+        if not self.image_store.tag_map or not reference:
+            QMessageBox.warning(self, "Failure", "No images to compare.")
+            return
 
-                img_stream = BytesIO()
-                pil_img.save(img_stream, format='PNG')
-                img_stream.seek(0)
+        filename, _ = QFileDialog.getSaveFileName(self, "Save metrics", "", "Excel Files (*.xlsx)")
+        if not filename:
+            return
 
-                slide.shapes.add_picture(img_stream, x, y, width=draw_width, height=draw_height)
+        self.wait_for_refresh()
+        self.metrics_thread = MetricsThread(filename, self.image_store, reference, self.workers_spin.value())
 
-                # Label vystředěný přesně pod obrázkem
-                text_box = slide.shapes.add_textbox(x, y + draw_height, draw_width, Inches(0.3))
-                tf_sample = text_box.text_frame
-                tf_sample.margin_left = 0
-                tf_sample.margin_right = 0
-                tf_sample.margin_top = 0
-                tf_sample.margin_bottom = 0
+        self.metrics_progress = QProgressDialog(f"Comparing with {reference}...", "Cancel", 0,
+                                                len(self.image_store.tags()), self)
+        self.metrics_progress.setWindowTitle("SSIM / PSNR metrics")
+        self.metrics_progress.setWindowModality(Qt.WindowModality.ApplicationModal)
+        self.metrics_progress.setMinimumDuration(0)
+        self.metrics_progress.setAutoClose(False)
+        self.metrics_progress.setAutoReset(False)
+        self.metrics_progress.canceled.connect(self.metrics_thread.cancel)
 
-                for p in tf_sample.paragraphs:
-                    p.alignment = 1  # CENTER
+        self.metrics_thread.progress_changed.connect(self.on_metrics_progress)
+        self.metrics_thread.metrics_finished.connect(self.on_metrics_finished)
+        self.metrics_thread.metrics_failed.connect(self.on_metrics_failed)
 
-                p_sample = tf_sample.paragraphs[0]
-                run_sample = p_sample.add_run()
-                run_sample.text = sample
-                font_sample = run_sample.font
-                font_sample.size = Pt(10)
-                font_sample.color.rgb = RGBColor(0, 0, 0)
+        # The store must not be reset while the metrics read from it
+        self.load_button.setEnabled(False)
+        self.clear_button.setEnabled(False)
+        self.metrics_button.setEnabled(False)
+        self.metrics_thread.start()
 
-                col += 1
-                if col >= max_columns:
-                    col = 0
-                    row += 1
+    def on_metrics_progress(self, current, total, tag):
+        self.metrics_progress.setMaximum(total)
+        self.metrics_progress.setValue(current)
+        self.metrics_progress.setLabelText(f"Comparing tag: {tag} ({current}/{total})")
 
-            progress.setValue(i + 1)
-        try:
-            prs.save(filename)
-        except Exception as e:
-            QMessageBox.warning(self, "Failure", f"Unable to save PowerPoint: {e}")
-            return
+    def _end_metrics(self):
+        self.metrics_progress.close()
+        self.load_button.setEnabled(True)
+        self.clear_button.setEnabled(True)
+        self.metrics_button.setEnabled(True)
+        self.start_refresh()
 
-        try:
-            if sys.platform.startswith('win'):
-                os.startfile(filename)
-            elif sys.platform.startswith('darwin'):
-                subprocess.run(['open', filename])
-            else:
-                subprocess.run(['xdg-open', filename])
-        except Exception as e:
-            print(f"Unable to open PowerPoint: {e}")
+    def on_metrics_failed(self, message):
+        self._end_metrics()
+        QMessageBox.warning(self, "Failure", f"Unable to save metrics: {message}")
 
-        QMessageBox.information(self, "Done", f"PowerPoint slides saved to:\n{filename}")
+    def on_metrics_finished(self, filename, pairs):
+        self._end_metrics()
+        QMessageBox.information(self, "Done", f"Metrics of {pairs} image pairs saved to:\n{filename}")
 
     def on_custom_images_loaded(self, image_paths):
-        """Handle images dropped in the Custom Images tab."""
-        print("Dropped images:", image_paths)
-        # Optionally, update something like a counter or status label:
-        # self.status_label.setText(f"{len(image_paths)} custom images loaded")
+        """Handle a batch of images dropped in the Custom Images tab; on_custom_progress shows the count."""
         self.custom_clear_button.setEnabled(True)
 
+    def on_custom_progress(self, decoded, total):
+        if total:
+            self.custom_status_label.setText(f"Loaded {decoded}/{total} images")
+
 
 if __name__ == "__main__":
-    
+    # Needed for the decoding process pool in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
+
+    startup_profile = None
+    if "--profile-startup" in sys.argv:
+        sys.argv.remove("--profile-startup")
+        startup_profile = StartupProfile()
+
     if hasattr(sys, '_MEIPASS'):
         icon_path = os.path.join(sys._MEIPASS, 'app_icon.ico')
     else:
@@ -665,7 +1080,14 @@ if __name__ == "__main__":
     dark_palette.setColor(QPalette.ColorRole.HighlightedText, QColor(255, 255, 255))
 
     app.setPalette(dark_palette)
+    if startup_profile:
+        startup_profile.mark("QApplication")
 
     window = InspectoApp()
+    if startup_profile:
+        startup_profile.mark("main window")
+        startup_profile.watch(window)
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    exit_code = app.exec()
+    shutdown_pools()
+    sys.exit(exit_code)
\ No newline at end of file
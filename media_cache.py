@@ -0,0 +1,122 @@
+# media_cache.py
+# Content-addressed cache of encoded images for the PowerPoint export.
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from thumbnails import DEFAULT_QUALITY, fit_to_box, to_buffer_mode
+
+IMAGE_FORMATS = ("auto", "png", "jpeg")
+DEFAULT_MAX_MB = 256
+JPEG_QUALITY = 90
+# Images with at most this many distinct colors (plots, screenshots, masks) stay PNG.
+# Grayscale photos never have more than 256 levels, so they get a lower limit.
+PNG_MAX_COLORS = 256
+PNG_MAX_GRAY_LEVELS = 32
+
+
+def content_key(pil_img):
+    """Digest of the decoded pixels, equal images give equal keys wherever they come from."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{pil_img.mode}|{pil_img.width}x{pil_img.height}|".encode("ascii"))
+    h.update(pil_img.tobytes())
+    return h.hexdigest()
+
+
+def choose_format(pil_img):
+    """PNG for transparency and flat-color content, JPEG for photographic content."""
+    if pil_img.mode in ("RGBA", "LA", "PA", "P", "1") or "transparency" in pil_img.info:
+        return "png"
+    max_colors = PNG_MAX_GRAY_LEVELS if pil_img.mode == "L" else PNG_MAX_COLORS
+    if pil_img.getcolors(max_colors) is not None:
+        return "png"
+    return "jpeg"
+
+
+def encode_image(pil_img, image_format):
+    bio = BytesIO()
+    if image_format == "jpeg":
+        img = pil_img if pil_img.mode in ("RGB", "L") else pil_img.convert("RGB")
+        img.save(bio, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    else:
+        pil_img.save(bio, format="PNG")
+    return bio.getvalue()
+
+
+def render_key(path, box_width, box_height, image_format):
+    """Cache key of a file rendered for one slide cell, changes when the file does."""
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{box_width}x{box_height}|{image_format}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def render_image(path, box_width, box_height, image_format="auto", quality=DEFAULT_QUALITY):
+    """
+    Worker entry point for the export: decode the original, fit it into
+    box_width x box_height pixels and encode it.
+    Returns ((w, h), bytes) or None if the image could not be read.
+    """
+    from PIL import Image
+    try:
+        img = to_buffer_mode(fit_to_box(Image.open(path), box_width, box_height, quality))
+        fmt = choose_format(img) if image_format == "auto" else image_format
+        return img.size, encode_image(img, fmt)
+    except Exception as e:
+        print(f"Error rendering image {path}: {e}")
+        return None
+
+
+class EncodedMediaCache:
+    """
+    content key + format -> encoded bytes, kept for the whole session.
+    Images rendered from originals are stored under their render_key().
+    Every distinct image is encoded once no matter how many tags or exports
+    use it. Identical bytes are also stored only once per deck, because
+    python-pptx reuses an image part whose SHA1 matches an existing one.
+    """
+
+    def __init__(self, max_mb=DEFAULT_MAX_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, pil_img, image_format="auto"):
+        """Encoded bytes of pil_img; image_format is one of IMAGE_FORMATS."""
+        fmt = choose_format(pil_img) if image_format == "auto" else image_format
+        key = (content_key(pil_img), fmt)
+        data = self.get(key)
+        if data is None:
+            data = encode_image(pil_img, fmt)
+            self.put(key, data)
+        return data
+
+    def get(self, key):
+        """Cached value for key or None. Values are bytes or ((w, h), bytes)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        nbytes = len(value if isinstance(value, bytes) else value[1])
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, old_bytes) = self._entries.popitem(last=False)
+                self._bytes -= old_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,176 @@
+# metrics.py
+# SSIM / PSNR of every sample against a reference sample, streamed to an xlsx file (no Qt).
+import math
+from collections import deque
+import numpy as np
+import xlsxwriter
+from diff_engine import thumbnail_to_array
+from thumbnail_cache import load_thumbnail_buffer
+from worker_pool import Cancelled, ordered_map
+
+# SSIM constants of Wang et al. with the 7x7 uniform window used by scikit-image
+SSIM_WINDOW = 7
+SSIM_K1 = 0.01
+SSIM_K2 = 0.03
+DATA_RANGE = 255.0
+
+
+def to_luma(rgb):
+    """float64 luminance (ITU-R BT.601) of an ...xHxWx3 uint8 array."""
+    return rgb @ np.array([0.299, 0.587, 0.114])
+
+
+def box_mean(a, size):
+    """Mean over every size x size window of the last two axes ("valid" windows only)."""
+    c = np.zeros(a.shape[:-2] + (a.shape[-2] + 1, a.shape[-1] + 1))
+    c[..., 1:, 1:] = a.cumsum(-2).cumsum(-1)
+    s = c[..., size:, size:] - c[..., :-size, size:] - c[..., size:, :-size] + c[..., :-size, :-size]
+    return s / (size * size)
+
+
+def ssim_batch(reference, others):
+    """
+    Mean SSIM of each of others (NxHxW luma) against reference (HxW luma),
+    computed for the whole batch at once. NaN if the images are smaller than the window.
+    """
+    if min(reference.shape) < SSIM_WINDOW:
+        return np.full(len(others), np.nan)
+    n = SSIM_WINDOW * SSIM_WINDOW
+    cov_norm = n / (n - 1)  # sample covariance, like scikit-image
+    c1 = (SSIM_K1 * DATA_RANGE) ** 2
+    c2 = (SSIM_K2 * DATA_RANGE) ** 2
+
+    ux = box_mean(reference, SSIM_WINDOW)
+    vx = cov_norm * (box_mean(reference * reference, SSIM_WINDOW) - ux * ux)
+    uy = box_mean(others, SSIM_WINDOW)
+    vy = cov_norm * (box_mean(others * others, SSIM_WINDOW) - uy * uy)
+    vxy = cov_norm * (box_mean(others * reference, SSIM_WINDOW) - ux * uy)
+
+    s = ((2 * ux * uy + c1) * (2 * vxy + c2)) / ((ux * ux + uy * uy + c1) * (vx + vy + c2))
+    return s.mean(axis=(-2, -1))
+
+
+def psnr_batch(reference, others):
+    """PSNR in dB of each of others (NxHxWx3) against reference (HxWx3); inf for identical images."""
+    err = others.astype(np.float64) - reference.astype(np.float64)
+    mse = (err * err).mean(axis=(1, 2, 3))
+    with np.errstate(divide="ignore"):
+        return 10 * np.log10(DATA_RANGE * DATA_RANGE / mse)
+
+
+def metrics_tag_job(reference_path, paths, max_width, quality):
+    """
+    Worker entry point: [(ssim, psnr) or None] of every path against the
+    reference, all samples of the tag scored as one batch. None if the
+    reference cannot be read.
+    """
+    ref_thumb = load_thumbnail_buffer(reference_path, max_width, quality)
+    if ref_thumb is None:
+        return None
+    reference = thumbnail_to_array(ref_thumb)
+    size = (ref_thumb.width, ref_thumb.height)
+    arrays = []
+    for path in paths:
+        thumb = load_thumbnail_buffer(path, max_width, quality)
+        arrays.append(thumbnail_to_array(thumb, size) if thumb is not None else None)
+    loaded = [a for a in arrays if a is not None]
+    if not loaded:
+        return [None] * len(paths)
+    others = np.stack(loaded)
+    ssim = ssim_batch(to_luma(reference), to_luma(others))
+    psnr = psnr_batch(reference, others)
+    scores = iter(zip(ssim.tolist(), psnr.tolist()))
+    return [next(scores) if a is not None else None for a in arrays]
+
+
+def metrics_jobs(store, reference):
+    """(tag, samples, job args) per tag that has the reference and at least one other sample."""
+    for tag in store.tags():
+        ref_path = store.path(tag, reference)
+        if ref_path is None:
+            continue
+        samples = [s for s in store.samples if s != reference and store.path(tag, s) is not None]
+        if samples:
+            yield tag, samples, (ref_path, [store.path(tag, s) for s in samples], store.max_width, store.quality)
+
+
+def number_or_text(value):
+    """xlsx has no inf/NaN: identical images get "inf", too small ones stay empty."""
+    if math.isnan(value):
+        return None
+    if math.isinf(value):
+        return "inf"
+    return value
+
+
+def write_metrics_xlsx(filename, store, reference, workers=None, should_stop=None, progress=None):
+    """
+    Score every sample of every tag of store against reference and write one
+    row per pair to filename, plus per-sample averages on a second sheet.
+    Rows are written as the tag jobs finish (in tag order) with xlsxwriter's
+    constant_memory mode, so memory does not grow with the number of pairs.
+    progress(done, total, tag) is called per tag. When should_stop() returns
+    True no more rows are added and the rows written so far are saved.
+    Returns the number of scored pairs.
+    """
+    workbook = xlsxwriter.Workbook(filename, {"constant_memory": True})
+    try:
+        sheet = workbook.add_worksheet("Metrics")
+        bold = workbook.add_format({"bold": True})
+        ssim_format = workbook.add_format({"num_format": "0.0000"})
+        psnr_format = workbook.add_format({"num_format": "0.00"})
+        sheet.write_row(0, 0, ["Tag", "Sample", "Reference", "SSIM", "PSNR (dB)"], bold)
+        sheet.set_column(0, 2, 24)
+        sheet.set_column(3, 4, 12)
+
+        totals = {}  # sample -> [pairs, ssim sum, ssim count, finite psnr sum, finite psnr count]
+        total_tags = sum(1 for _ in metrics_jobs(store, reference))
+        row = 1
+        done = 0
+        submitted = deque()  # (tag, samples) of the jobs in flight, in order
+
+        def job_args():
+            for tag, samples, args in metrics_jobs(store, reference):
+                submitted.append((tag, samples))
+                yield args
+
+        try:
+            for scores in ordered_map(metrics_tag_job, job_args(), workers, should_stop=should_stop):
+                tag, samples = submitted.popleft()
+                for sample, score in zip(samples, scores or ()):
+                    if score is None:
+                        continue
+                    ssim, psnr = score
+                    sheet.write_string(row, 0, tag)
+                    sheet.write_string(row, 1, sample)
+                    sheet.write_string(row, 2, reference)
+                    sheet.write(row, 3, number_or_text(ssim), ssim_format)
+                    sheet.write(row, 4, number_or_text(psnr), psnr_format)
+                    row += 1
+                    t = totals.setdefault(sample, [0, 0.0, 0, 0.0, 0])
+                    t[0] += 1
+                    if not math.isnan(ssim):
+                        t[1] += ssim
+                        t[2] += 1
+                    if math.isfinite(psnr):
+                        t[3] += psnr
+                        t[4] += 1
+                done += 1
+                if progress:
+                    progress(done, total_tags, tag)
+        except Cancelled:
+            pass
+
+        summary = workbook.add_worksheet("Samples")
+        summary.write_row(0, 0, ["Sample", "Pairs", "Mean SSIM", "Mean PSNR (dB, finite only)"], bold)
+        summary.set_column(0, 0, 24)
+        summary.set_column(1, 3, 16)
+        for r, sample in enumerate((s for s in store.samples if s in totals), start=1):
+            pairs, ssim_sum, ssim_n, psnr_sum, psnr_n = totals[sample]
+            summary.write_string(r, 0, sample)
+            summary.write_number(r, 1, pairs)
+            summary.write(r, 2, ssim_sum / ssim_n if ssim_n else None, ssim_format)
+            summary.write(r, 3, psnr_sum / psnr_n if psnr_n else None, psnr_format)
+    finally:
+        workbook.close()
+    return row - 1
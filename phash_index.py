@@ -0,0 +1,204 @@
+# phash_index.py
+# Perceptual hashes (dHash) of the loaded images and fast Hamming distance queries (no Qt).
+# numpy and PIL are imported on first use, the GUI shows its window without them.
+import threading
+from array import array
+from functools import lru_cache
+from thumbnail_cache import load_thumbnail_buffer
+
+HASH_SIZE = 8  # 8x8 gradient bits -> one uint64 per image
+OUTLIER_MIN_SAMPLES = 3  # a majority needs at least three images of a tag
+REMOVED = 0xFFFFFFFF  # tag id of rows deleted by remove()
+DUPLICATE_WINDOW = 8  # neighbours compared inside one hash bucket
+MAX_DUPLICATE_DISTANCE = 7  # needs max_distance + 1 chunks of at least 8 bits
+
+
+@lru_cache(maxsize=None)
+def spread_table():
+    """
+    byte value -> uint64 holding one byte lane per bit (MSB first), so summing
+    these counts 8 bits at once as long as no lane exceeds 255.
+    """
+    import numpy as np
+    return np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).view(np.uint64).ravel()
+
+
+def dhash(img):
+    """64 bit difference hash: brightness gradient between neighbouring columns of a 9x8 image."""
+    import numpy as np
+    from PIL import Image
+    small = np.asarray(img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def load_thumbnail_hashed(path, max_width, quality):
+    """Worker entry point: (Thumbnail or None, dHash or None); hashing the thumbnail costs ~0.1 ms."""
+    thumb = load_thumbnail_buffer(path, max_width, quality)
+    if thumb is None:
+        return None, None
+    return thumb, dhash(thumb.to_pil())
+
+
+def popcount(a):
+    import numpy as np
+    return np.bitwise_count(a).astype(np.int64)
+
+
+def majority_hashes(hashes, starts, counts):
+    """Bitwise majority hash of each group hashes[starts[i]:starts[i] + counts[i]]."""
+    import numpy as np
+    as_bytes = hashes.astype(">u8").view(np.uint8).reshape(-1, 8)
+    if counts.max() > 255:
+        votes = np.add.reduceat(np.unpackbits(as_bytes, axis=1), starts, axis=0, dtype=np.uint32)
+    else:
+        votes = np.empty((len(starts), 64), dtype=np.uint8)
+        for k in range(8):
+            lanes = np.add.reduceat(spread_table()[as_bytes[:, k]], starts)
+            votes[:, 8 * k:8 * k + 8] = lanes.view(np.uint8).reshape(-1, 8)
+    above = votes.astype(np.uint32) * 2 > counts[:, None]
+    return np.packbits(above, axis=1).view(">u8").ravel().astype(np.uint64)
+
+
+class PHashIndex:
+    """
+    dHash of every (tag, sample) as three parallel arrays (tag id, sample id,
+    uint64 hash), 12 bytes per image. Queries copy the arrays once and run
+    vectorized, so they take milliseconds for hundreds of thousands of images.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, samples=()):
+        with self._lock:
+            self.samples = list(samples)
+            self._sample_ids = {s: i for i, s in enumerate(self.samples)}
+            self.tags = []
+            self._tag_ids = {}
+            self._rows = {}  # (tag id, sample id) -> row
+            self._tag_col = array("I")
+            self._sample_col = array("I")
+            self._hash_col = array("Q")
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, tag, sample, image_hash):
+        """Store the hash of (tag, sample), replacing an earlier one."""
+        with self._lock:
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is None:
+                tag_id = self._tag_ids[tag] = len(self.tags)
+                self.tags.append(tag)
+            sample_id = self._sample_ids.get(sample)
+            if sample_id is None:
+                sample_id = self._sample_ids[sample] = len(self.samples)
+                self.samples.append(sample)
+            row = self._rows.get((tag_id, sample_id))
+            if row is not None:
+                self._hash_col[row] = image_hash
+                return
+            self._rows[(tag_id, sample_id)] = len(self._hash_col)
+            self._tag_col.append(tag_id)
+            self._sample_col.append(sample_id)
+            self._hash_col.append(image_hash)
+
+    def remove(self, tag, sample):
+        with self._lock:
+            row = self._rows.pop((self._tag_ids.get(tag), self._sample_ids.get(sample)), None)
+            if row is not None:
+                self._tag_col[row] = REMOVED
+
+    def _snapshot(self):
+        """Copies of the live rows, safe to use while the loader keeps adding."""
+        import numpy as np
+        with self._lock:
+            tag_ids = np.array(self._tag_col, dtype=np.int64)
+            sample_ids = np.array(self._sample_col, dtype=np.int64)
+            hashes = np.array(self._hash_col, dtype=np.uint64)
+        if len(self._rows) < len(tag_ids):
+            live = tag_ids != REMOVED
+            return tag_ids[live], sample_ids[live], hashes[live]
+        return tag_ids, sample_ids, hashes
+
+    def _key(self, tag_ids, sample_ids, i):
+        return self.tags[tag_ids[i]], self.samples[sample_ids[i]]
+
+    def outliers(self, top=50, min_distance=1):
+        """
+        [(distance, tag, sample)] of the images that differ most from the
+        bitwise majority hash of their tag, largest distance first. Tags with
+        fewer than OUTLIER_MIN_SAMPLES images are skipped.
+        """
+        import numpy as np
+        tag_ids, sample_ids, hashes = self._snapshot()
+        if not len(hashes):
+            return []
+        order = np.argsort(tag_ids, kind="stable")
+        tag_sorted = tag_ids[order]
+        hash_sorted = hashes[order]
+        starts = np.flatnonzero(np.r_[True, tag_sorted[1:] != tag_sorted[:-1]])
+        counts = np.diff(np.r_[starts, len(order)])
+
+        majority = majority_hashes(hash_sorted, starts, counts)
+        distance = popcount(hash_sorted ^ np.repeat(majority, counts))
+        distance[np.repeat(counts < OUTLIER_MIN_SAMPLES, counts)] = -1
+        candidates = np.flatnonzero(distance >= min_distance)
+        if len(candidates) > top:
+            candidates = candidates[np.argpartition(-distance[candidates], top - 1)[:top]]
+        candidates = candidates[np.lexsort((order[candidates], -distance[candidates]))]
+        return [(int(distance[i]),) + self._key(tag_ids, sample_ids, order[i]) for i in candidates]
+
+    def near_duplicates(self, max_distance=3, across_tags=True, limit=1000):
+        """
+        [(distance, (tag, sample), (tag, sample))] of image pairs whose hashes
+        differ in at most max_distance bits, closest first. across_tags only
+        reports pairs from different tags. Raises ValueError when max_distance
+        is above MAX_DUPLICATE_DISTANCE.
+
+        The hash is split into max_distance + 1 chunks; two hashes that close
+        share at least one chunk exactly, so only neighbours in the sort order
+        of each chunk are compared. The result is approximate: each image is
+        compared with at most DUPLICATE_WINDOW neighbours per chunk, so pairs
+        in crowded buckets (many near-identical images) can be missed.
+        """
+        if not 0 <= max_distance <= MAX_DUPLICATE_DISTANCE:
+            raise ValueError(f"max_distance must be between 0 and {MAX_DUPLICATE_DISTANCE}, not {max_distance}")
+        import numpy as np
+        tag_ids, sample_ids, hashes = self._snapshot()
+        n = len(hashes)
+        if n < 2:
+            return []
+        chunks = max_distance + 1
+        firsts = []
+        seconds = []
+        for c in range(chunks):
+            lo = c * 64 // chunks
+            hi = (c + 1) * 64 // chunks
+            value = (hashes >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+            if hi - lo <= 32:
+                # Narrow keys make the stable (radix) sort much faster
+                value = value.astype(np.uint16 if hi - lo <= 16 else np.uint32)
+            order = np.argsort(value, kind="stable")
+            sorted_value = value[order]
+            sorted_tag = tag_ids[order]
+            for step in range(1, min(DUPLICATE_WINDOW, n - 1) + 1):
+                same = sorted_value[:-step] == sorted_value[step:]
+                if across_tags:
+                    # Samples of one tag are usually near-identical, drop them before the gather
+                    same &= sorted_tag[:-step] != sorted_tag[step:]
+                same = np.flatnonzero(same)
+                firsts.append(order[same])
+                seconds.append(order[same + step])
+        a = np.concatenate(firsts)
+        b = np.concatenate(seconds)
+        keep = popcount(hashes[a] ^ hashes[b]) <= max_distance
+        a, b = a[keep], b[keep]
+        pairs = np.unique(np.minimum(a, b) * n + np.maximum(a, b))
+        a, b = pairs // n, pairs % n
+        distance = popcount(hashes[a] ^ hashes[b])
+        best = np.argsort(distance, kind="stable")[:limit]
+        return [(int(distance[i]), self._key(tag_ids, sample_ids, a[i]), self._key(tag_ids, sample_ids, b[i]))
+                for i in best]
@@ -0,0 +1,177 @@
+# pipeline.py
+# Qt-free scan -> decode -> export steps, shared by the GUI and the command line.
+import time
+from bisect import bisect_left
+from scanner import scan_folder
+from phash_index import load_thumbnail_hashed
+from thumbnail_cache import load_thumbnail_buffer
+from worker_pool import ordered_map
+
+
+def format_scan_stats(stats):
+    if stats.get("indexed"):
+        return (f"Read folder index of {stats['dirs']} dirs ({stats['images']} images, "
+                f"{stats['tags']} tags) in {stats['walk_s']:.2f} s")
+    return (f"Scanned {stats['dirs']} dirs, {stats['files']} files "
+            f"({stats['images']} images, {stats['tags']} tags) "
+            f"in {stats['walk_s']:.2f} s (sort {stats['sort_s']:.3f} s)")
+
+
+def decode_folder(store, workers, should_stop=None, on_tag=None, hash_index=None):
+    """
+    Decode every image of the dataset described by store (see ImageStore.reset)
+    in the process pool and put the thumbnails into store. With a hash_index
+    (PHashIndex) the workers also hash every thumbnail into it.
+
+    on_tag(done, total, tag) is called when all images of a tag are in the
+    store; tags complete in sorted order. Raises worker_pool.Cancelled when
+    should_stop() turns true. Returns the number of decoded images.
+    """
+    samples, tag_map = store.samples, store.tag_map
+    tags = sorted(tag_map.keys())
+    total_tags = len(tags)
+
+    jobs = []
+    remaining = {}
+    for tag in tags:
+        remaining[tag] = 0
+        for sample in samples:
+            path = tag_map[tag].get(sample)
+            if path:
+                jobs.append((tag, sample, path))
+                remaining[tag] += 1
+
+    if hash_index is not None:
+        hash_index.reset(samples)
+
+    # Every tag has at least one image and results arrive in job order,
+    # so tags complete one after another
+    done_tags = 0
+    t_decode = time.perf_counter()
+    for tag, sample, thumb in decode_images(store, jobs, workers, should_stop, hash_index):
+        remaining[tag] -= 1
+        if remaining[tag] == 0:
+            done_tags += 1
+            if on_tag:
+                on_tag(done_tags, total_tags, tag)
+    print(f"Decoded {len(jobs)} images in {time.perf_counter() - t_decode:.2f} s "
+          f"with {workers} worker(s)")
+    return len(jobs)
+
+
+def decode_images(store, jobs, workers, should_stop=None, hash_index=None):
+    """
+    Decode [(tag, sample, path)] in the process pool, put the thumbnails into
+    store (and their hashes into hash_index) and yield (tag, sample, thumb)
+    in job order.
+    """
+    func = load_thumbnail_buffer if hash_index is None else load_thumbnail_hashed
+    results = ordered_map(func, ((path, store.max_width, store.quality) for _, _, path in jobs),
+                          workers, should_stop=should_stop)
+    for (tag, sample, path), result in zip(jobs, results):
+        if hash_index is None:
+            thumb = result
+        else:
+            thumb, image_hash = result
+            if image_hash is not None:
+                hash_index.add(tag, sample, image_hash)
+            else:
+                hash_index.remove(tag, sample)
+        store.put(tag, sample, thumb)
+        yield tag, sample, thumb
+
+
+def rerender_folder(store, max_width, workers, first_tag=None, should_stop=None, on_tag=None):
+    """
+    Decode again, at max_width, the loaded thumbnails that are narrower, after
+    the view width was raised; evicted ones are reloaded at max_width anyway.
+    Tags from first_tag on go first (the visible ones), then the tags before
+    it. on_tag(tag) is called once all thumbnails of a tag are replaced.
+    Raises worker_pool.Cancelled when should_stop() turns true. Returns the
+    number of decoded images.
+    """
+    store.set_max_width(max_width)
+    by_tag = {}
+    for tag, sample in store.narrower_than(max_width):
+        path = store.path(tag, sample)
+        if path:
+            by_tag.setdefault(tag, []).append((tag, sample, path))
+    tags = sorted(by_tag)
+    start = bisect_left(tags, first_tag) if first_tag is not None else 0
+    jobs = [job for tag in tags[start:] + tags[:start] for job in by_tag[tag]]
+
+    remaining = {tag: len(tag_jobs) for tag, tag_jobs in by_tag.items()}
+    t_decode = time.perf_counter()
+    for tag, _, _ in decode_images(store, jobs, workers, should_stop):
+        remaining[tag] -= 1
+        if remaining[tag] == 0 and on_tag:
+            on_tag(tag)
+    print(f"Re-rendered {len(jobs)} images at {max_width} px in {time.perf_counter() - t_decode:.2f} s")
+    return len(jobs)
+
+
+def refresh_folder(state, paths, store, workers, hash_index=None, folder_index=None):
+    """
+    Incremental update after the directories in paths changed: rescan only
+    those (scanner.FolderState), patch store and re-decode only the added or
+    modified images. A folder_index (FolderIndex) is updated to match.
+    Returns (changed tags, removed tags, new directories, whether the
+    sample list changed).
+    """
+    n_samples = len(state.samples)
+    added, removed, new_dirs = state.rescan(paths)
+    samples_changed = len(state.samples) != n_samples
+    gone = store.update_paths(added, removed, state.samples if samples_changed else None)
+    if hash_index is not None:
+        for tag, sample, _ in removed:
+            if store.path(tag, sample) is None:
+                hash_index.remove(tag, sample)
+    for _ in decode_images(store, added, workers, hash_index=hash_index):
+        pass
+    changed = {tag for tag, _, _ in added} | {tag for tag, _, _ in removed}
+    if folder_index is not None:
+        try:
+            folder_index.update(state.samples, store.tag_map, state.dirs, list(paths) + new_dirs, changed, store)
+        except Exception as e:
+            print(f"Folder index update failed: {e}")
+    return sorted(changed - gone), sorted(gone), new_dirs, samples_changed
+
+
+def load_folder(base_path, store, max_width, quality, workers, should_stop=None, on_scanned=None, on_tag=None,
+                hash_index=None, dirs=None, folder_index=None):
+    """
+    Scan base_path, reset store to the result and decode all thumbnails.
+    on_scanned(samples, tag_map, sized) runs before decoding starts; dirs is
+    filled with the directory listing for a later FolderState. With a
+    folder_index (FolderIndex) a saved listing replaces the scan
+    (stats["indexed"]; pass stale_dirs(dirs) to refresh_folder() afterwards),
+    and when it holds the thumbnail sizes for max_width and quality they go
+    into store before decoding (sized is True), so every tag can be shown
+    right away. A fresh scan, or sizes that were missing, are saved once
+    decoding is done. Returns (samples, tag_map, scan stats); the
+    store is left untouched when should_stop() turned true during the scan
+    (stats["cancelled"]). Raises worker_pool.Cancelled when stopped during
+    decoding.
+    """
+    dirs = {} if dirs is None else dirs
+    indexed = folder_index.load(max_width, quality) if folder_index is not None else None
+    sizes = {}
+    if indexed is not None:
+        samples, tag_map, index_dirs, sizes, stats = indexed
+        dirs.update(index_dirs)
+    else:
+        samples, tag_map, stats = scan_folder(base_path, should_stop, dirs)
+        if stats["cancelled"]:
+            return samples, tag_map, stats
+    print(format_scan_stats(stats))
+    store.reset(samples, tag_map, max_width, quality)
+    store.set_sizes(sizes)
+    if on_scanned:
+        on_scanned(samples, tag_map, bool(sizes))
+    decode_folder(store, workers, should_stop, on_tag, hash_index)
+    if folder_index is not None and (indexed is None or not sizes):
+        try:
+            folder_index.save(samples, tag_map, dirs, stats["files"], store)
+        except Exception as e:
+            print(f"Folder index not saved: {e}")
+    return samples, tag_map, stats
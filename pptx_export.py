@@ -0,0 +1,247 @@
+# pptx_export.py
+# PowerPoint export (no Qt): one slide per tag with the images of all samples.
+# python-pptx and PIL are imported on first use, they are slow to load at startup.
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from media_cache import IMAGE_FORMATS, EncodedMediaCache, render_image, render_key
+from worker_pool import default_workers, ordered_map
+
+# "original" embeds the source files instead of the thumbnails
+EXPORT_FORMATS = IMAGE_FORMATS + ("original",)
+# Formats PowerPoint shows as they are on disk
+PASSTHROUGH_FORMATS = ("JPEG", "PNG")
+# Longest side of originals that have to be re-encoded
+ORIGINAL_MAX_SIDE = 3000
+# Slide width in pixels the images are rendered for, 0 reuses the thumbnails
+EXPORT_RESOLUTIONS = (0, 1280, 1920, 3840)
+
+
+def slide_cell_size(slide_width, slide_height, n_samples, max_columns):
+    """(width, height) in EMU of one image cell, the layout of add_tag_slide()."""
+    from pptx.util import Inches
+    margin = Inches(0.5)
+    padding = Inches(0.2)
+    header_height = Inches(0.7)
+    usable_width = slide_width - 2 * margin
+    usable_height = slide_height - 2 * margin - header_height
+    rows = (n_samples + max_columns - 1) // max_columns
+    return ((usable_width - (max_columns - 1) * padding) / max_columns,
+            (usable_height - (rows - 1) * padding) / rows)
+
+
+def cell_pixel_box(prs, n_samples, max_columns, resolution):
+    """Pixel size of one image cell when the slide is shown resolution pixels wide."""
+    cell_width, cell_height = slide_cell_size(prs.slide_width, prs.slide_height, n_samples, max_columns)
+    scale = resolution / prs.slide_width
+    return max(1, round(cell_width * scale)), max(1, round(cell_height * scale))
+
+
+def load_original(path, media_cache):
+    """
+    ((w, h), bytes) of the source file, embedded without decoding when
+    PowerPoint can show it (only the header is parsed for the size).
+    CMYK JPEGs and other formats are decoded, scaled down to
+    ORIGINAL_MAX_SIDE and encoded through media_cache. None on failure.
+    """
+    if path is None:
+        return None
+    from PIL import Image
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        with Image.open(BytesIO(data)) as img:
+            if img.format in PASSTHROUGH_FORMATS and img.mode != "CMYK":
+                return img.size, data
+            img.thumbnail((ORIGINAL_MAX_SIDE, ORIGINAL_MAX_SIDE), reducing_gap=2.0)
+            if img.mode == "CMYK":
+                img = img.convert("RGB")
+            return img.size, media_cache.encode(img, "auto")
+    except Exception as e:
+        print(f"Error loading image {path}: {e}")
+        return None
+
+
+def render_tag_images(tag, samples, image_path, media_cache, image_format, box, workers):
+    """Originals of tag fitted to box (w, h) pixels, rendered in the process pool."""
+    rendered = {}
+    jobs = []
+    for sample in samples:
+        path = image_path(tag, sample)
+        if path is None:
+            continue
+        try:
+            key = render_key(path, box[0], box[1], image_format)
+        except OSError as e:
+            print(f"Error loading image {path}: {e}")
+            continue
+        item = media_cache.get(key)
+        if item is not None:
+            rendered[sample] = item
+        else:
+            jobs.append((sample, key, path))
+
+    results = ordered_map(render_image, [(path, box[0], box[1], image_format) for _, _, path in jobs], workers)
+    for (sample, key, _), item in zip(jobs, results):
+        if item is not None:
+            media_cache.put(key, item)
+            rendered[sample] = item
+    return [(sample,) + rendered[sample] for sample in samples if sample in rendered]
+
+
+def encode_tag_images(tag, samples, load_image, media_cache, image_format="auto", image_path=None,
+                      box=None, workers=None):
+    """
+    [(sample, (w, h), encoded bytes)] for the samples of tag that have an image.
+    With image_format "original" image_path(tag, sample) gives the file to embed,
+    with a box the originals are rendered to that pixel size instead of using load_image.
+    """
+    if box is not None and image_format != "original":
+        return render_tag_images(tag, samples, image_path, media_cache, image_format, box, workers)
+    encoded = []
+    for sample in samples:
+        if image_format == "original":
+            item = load_original(image_path(tag, sample), media_cache)
+        else:
+            pil_img = load_image(tag, sample)
+            item = None if pil_img is None else (pil_img.size, media_cache.encode(pil_img, image_format))
+        if item is not None:
+            encoded.append((sample,) + item)
+    return encoded
+
+
+def add_tag_slide(prs, tag, samples, images, max_columns):
+    """Add one slide for tag; images is the output of encode_tag_images()."""
+    from pptx.dml.color import RGBColor
+    from pptx.util import Inches, Pt
+    slide_width = prs.slide_width
+    slide_height = prs.slide_height
+
+    margin = Inches(0.5)
+    padding = Inches(0.2)
+
+    usable_width = slide_width - 2 * margin
+
+    img_width, img_height = slide_cell_size(slide_width, slide_height, len(samples), max_columns)
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])  # prázdný slide
+
+    # Tag vlevo nahoře
+    header_height = Inches(0.4)
+    tag_box = slide.shapes.add_textbox(margin, margin, usable_width, header_height)
+
+    # Nastavení výplně na světle šedou (třeba RGB 220,220,220)
+    fill = tag_box.fill
+    fill.solid()
+    fill.fore_color.rgb = RGBColor(220, 220, 220)
+
+    # Nastavení černého rámečku
+    line = tag_box.line
+    line.color.rgb = RGBColor(0, 0, 0)
+    line.width = Pt(1)  # tloušťka rámečku
+
+    tf2 = tag_box.text_frame
+    p2 = tf2.paragraphs[0]
+    p2.alignment = 1  # zarovnání vlevo
+    run2 = p2.add_run()
+    run2.text = f"tag: {tag}"
+    font2 = run2.font
+    font2.size = Pt(16)
+    font2.bold = False
+    font2.color.rgb = RGBColor(0, 0, 0)
+
+    col = 0
+    row = 0
+
+    extra_top_padding = Inches(0.3)  # pevná mezera pod tagem
+
+    for sample, (w, h), data in images:
+        ratio = w / h
+        draw_width = img_width
+        draw_height = img_width / ratio
+
+        if draw_height > img_height:
+            draw_height = img_height
+            draw_width = img_height * ratio
+
+        x = margin + col * (img_width + padding)
+        y = margin + header_height + extra_top_padding + row * (img_height + padding)
+
+        slide.shapes.add_picture(BytesIO(data), x, y, width=draw_width, height=draw_height)
+
+        # Label vystředěný přesně pod obrázkem
+        text_box = slide.shapes.add_textbox(x, y + draw_height, draw_width, Inches(0.3))
+        tf_sample = text_box.text_frame
+        tf_sample.margin_left = 0
+        tf_sample.margin_right = 0
+        tf_sample.margin_top = 0
+        tf_sample.margin_bottom = 0
+
+        for p in tf_sample.paragraphs:
+            p.alignment = 1  # CENTER
+
+        p_sample = tf_sample.paragraphs[0]
+        run_sample = p_sample.add_run()
+        run_sample.text = sample
+        font_sample = run_sample.font
+        font_sample.size = Pt(10)
+        font_sample.color.rgb = RGBColor(0, 0, 0)
+
+        col += 1
+        if col >= max_columns:
+            col = 0
+            row += 1
+
+
+def export_pptx(filename, tags, samples, load_image, max_columns,
+                workers=None, progress=None, should_stop=None,
+                media_cache=None, image_format="auto", image_path=None, resolution=0):
+    """
+    Build and save the deck. load_image(tag, sample) returns a PIL image or None.
+    Pass a long lived media_cache to reuse encodings across exports;
+    image_format is "auto" (per image), "png", "jpeg" or "original", which
+    embeds the files given by image_path(tag, sample) instead of load_image.
+    A non-zero resolution renders the files from image_path to the exact
+    pixel size of their slide cell on a slide that many pixels wide,
+    decoding in the shared process pool.
+
+    Images of the next tags are encoded in a thread pool (PIL releases the
+    GIL while compressing) while slides are assembled in tag order here.
+    progress(done, total, tag) is called after each slide. When
+    should_stop() returns True no more slides are added and the slides
+    built so far are saved. Returns the number of exported tags.
+    """
+    from pptx import Presentation
+    workers = workers or default_workers()
+    media_cache = media_cache or EncodedMediaCache()
+    samples = list(dict.fromkeys(samples))
+    prs = Presentation()
+    box = cell_pixel_box(prs, len(samples), max_columns, resolution) if resolution else None
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        tag_iter = iter(tags)
+
+        def submit_next():
+            tag = next(tag_iter, None)
+            if tag is not None:
+                pending.append((tag, pool.submit(encode_tag_images, tag, samples, load_image,
+                                                   media_cache, image_format, image_path, box, workers)))
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            if should_stop and should_stop():
+                for _, future in pending:
+                    future.cancel()
+                break
+            tag, future = pending.popleft()
+            images = future.result()
+            submit_next()
+            add_tag_slide(prs, tag, samples, images, max_columns)
+            done += 1
+            if progress:
+                progress(done, len(tags), tag)
+
+    prs.save(filename)
+    return done
@@ -0,0 +1,29 @@
+# qt_images.py
+# Qt side of the thumbnail handoff: raw buffers -> QImage -> QPixmap (GUI thread only).
+from PyQt6.QtGui import QImage, QPixmap
+
+QIMAGE_FORMATS = {
+    "RGB": QImage.Format.Format_RGB888,
+    "RGBA": QImage.Format.Format_RGBA8888,
+    "L": QImage.Format.Format_Grayscale8,
+}
+
+
+def thumbnail_to_qimage(thumb):
+    """
+    Wrap a thumbnails.Thumbnail buffer in a QImage without copying pixels.
+    QImage is safe to create in worker threads; the buffer is kept alive
+    on the wrapper for as long as the QImage exists.
+    """
+    if thumb is None:
+        return None
+    qimage = QImage(thumb.data, thumb.width, thumb.height, thumb.bytes_per_line, QIMAGE_FORMATS[thumb.mode])
+    qimage._buffer = thumb.data
+    return qimage
+
+
+def qimage_to_pixmap(qimage):
+    """Must be called on the GUI thread."""
+    if qimage is None or qimage.isNull():
+        return None
+    return QPixmap.fromImage(qimage)
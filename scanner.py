@@ -0,0 +1,246 @@
+# scanner.py
+# Single-pass discovery of sample directories (ED*) and their image files.
+import os
+import time
+from thumbnails import is_image_file
+
+
+def is_sample_dir(name):
+    return name.upper().startswith("ED")
+
+
+def file_stamp(st):
+    """(mtime, size) of an os.stat() result; an image whose stamp differs was rewritten."""
+    return st.st_mtime_ns, st.st_size
+
+
+def scan_folder(base_path, should_stop=None, dirs=None):
+    """
+    Walk base_path once with os.scandir and build the sample list and tag_map.
+
+    Every ED* directory at any depth is a sample, and every image below it
+    (including inside nested ED* directories) belongs to that sample.
+    Returns (samples, tag_map, stats) where stats holds counters and
+    per-phase timings in seconds. should_stop is checked once per
+    directory; when it returns True the partial result is returned with
+    stats["cancelled"] set. A dirs dict is filled with the listing of
+    every directory, see FolderState.
+    """
+    t_start = time.perf_counter()
+    samples = []
+    tag_map = {}
+    owner = {}  # (tag, sample) -> index of the sample directory that wrote it
+    n_dirs = 0
+    n_files = 0
+    n_images = 0
+
+    # (path, indices of enclosing sample directories), visited in os.walk order
+    stack = [(base_path, ())]
+    cancelled = False
+    while stack:
+        if should_stop and should_stop():
+            cancelled = True
+            break
+        path, active = stack.pop()
+        n_dirs += 1
+        subdirs = []
+        files = {}
+        try:
+            # Taken before listing: a change made meanwhile shows up as a different mtime later
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        continue
+                    if is_dir:
+                        subdirs.append(entry)
+                        continue
+                    n_files += 1
+                    if not active or not is_image_file(entry.name):
+                        continue
+                    try:
+                        files[entry.name] = file_stamp(entry.stat())
+                    except OSError:
+                        continue
+                    n_images += 1
+                    tag = entry.name.lower()
+                    for idx in active:
+                        sample = samples[idx]
+                        # Later sample directories win, like the old per-sample walk
+                        key = (tag, sample)
+                        if owner.get(key, -1) <= idx:
+                            owner[key] = idx
+                            tag_map.setdefault(tag, {})[sample] = entry.path
+        except OSError as e:
+            print(f"Unable to scan {path}: {e}")
+            continue
+        if dirs is not None:
+            dirs[path] = (active, files, mtime_ns)
+
+        children = []
+        for entry in subdirs:
+            child_active = active
+            if is_sample_dir(entry.name):
+                samples.append(entry.name)
+                child_active = active + (len(samples) - 1,)
+            elif entry.is_symlink():
+                continue
+            children.append((entry.path, child_active))
+        stack.extend(reversed(children))
+
+    t_walk = time.perf_counter()
+    tags = sorted(tag_map.keys())
+    t_sort = time.perf_counter()
+
+    stats = {
+        "dirs": n_dirs,
+        "files": n_files,
+        "images": n_images,
+        "tags": len(tags),
+        "walk_s": t_walk - t_start,
+        "sort_s": t_sort - t_walk,
+        "cancelled": cancelled,
+    }
+    return samples, tag_map, stats
+
+
+def iter_image_files(paths, should_stop=None):
+    """
+    Yield paths in order, replacing every directory by the image files below
+    it. Directories are listed one at a time (files sorted by name, then
+    subdirectories depth first) so the first files come out right away;
+    symlinked subdirectories are skipped, like in scan_folder(). Stops early
+    when should_stop() turns true (checked once per directory).
+    """
+    for top in paths:
+        if not os.path.isdir(top):
+            yield top
+            continue
+        stack = [top]
+        while stack:
+            if should_stop and should_stop():
+                return
+            path = stack.pop()
+            files = []
+            subdirs = []
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                if not entry.is_symlink():
+                                    subdirs.append(entry.path)
+                            elif is_image_file(entry.name):
+                                files.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError as e:
+                print(f"Unable to scan {path}: {e}")
+                continue
+            files.sort()
+            yield from files
+            stack.extend(sorted(subdirs, reverse=True))
+
+
+class FolderState:
+    """
+    Directory listing kept from scan_folder(dirs=...), so that change
+    notifications for a few directories turn into per-image updates
+    without walking the whole tree again.
+    """
+
+    def __init__(self, samples, dirs):
+        self.samples = list(samples)
+        # path -> (indices of enclosing samples, {image name: file_stamp()}, directory mtime in ns)
+        self.dirs = dirs
+
+    def rescan(self, paths):
+        """
+        List the directories in paths again. Returns (added, removed, new_dirs):
+        [(tag, sample, path)] of new or modified images, [(tag, sample, path)]
+        of deleted ones, and directories that appeared (already registered).
+        New sample directories are appended to self.samples.
+        """
+        added = []
+        removed = []
+        new_dirs = []
+        for path in paths:
+            state = self.dirs.get(path)
+            if state is None:
+                continue  # unknown or already dropped with its parent
+            active, old_files, _ = state
+            if not os.path.isdir(path):
+                self._drop_tree(path, removed)
+                continue
+
+            files = {}
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                if entry.path not in self.dirs:
+                                    self._add_tree(entry, active, added, new_dirs)
+                                continue
+                            if not active or not is_image_file(entry.name):
+                                continue
+                            files[entry.name] = stamp = file_stamp(entry.stat())
+                        except OSError:
+                            continue
+                        # Same mtime and size as listed before: unchanged
+                        if old_files.get(entry.name) == stamp:
+                            continue
+                        for idx in active:
+                            added.append((entry.name.lower(), self.samples[idx], entry.path))
+            except OSError as e:
+                print(f"Unable to scan {path}: {e}")
+                continue
+            for name in old_files.keys() - files.keys():
+                for idx in active:
+                    removed.append((name.lower(), self.samples[idx], os.path.join(path, name)))
+            self.dirs[path] = (active, files, mtime_ns)
+        return added, removed, new_dirs
+
+    def _add_tree(self, entry, active, added, new_dirs):
+        """Register a directory that appeared and everything below it."""
+        if is_sample_dir(entry.name):
+            self.samples.append(entry.name)
+            active = active + (len(self.samples) - 1,)
+        elif entry.is_symlink():
+            return
+        files = {}
+        subdirs = []
+        try:
+            mtime_ns = os.stat(entry.path).st_mtime_ns
+            with os.scandir(entry.path) as it:
+                for child in it:
+                    try:
+                        if child.is_dir():
+                            subdirs.append(child)
+                            continue
+                        if not active or not is_image_file(child.name):
+                            continue
+                        files[child.name] = file_stamp(child.stat())
+                    except OSError:
+                        continue
+                    for idx in active:
+                        added.append((child.name.lower(), self.samples[idx], child.path))
+        except OSError as e:
+            print(f"Unable to scan {entry.path}: {e}")
+            return
+        self.dirs[entry.path] = (active, files, mtime_ns)
+        new_dirs.append(entry.path)
+        for child in subdirs:
+            self._add_tree(child, active, added, new_dirs)
+
+    def _drop_tree(self, path, removed):
+        """Forget a deleted directory and everything below it."""
+        prefix = path + os.sep
+        for sub in [d for d in self.dirs if d == path or d.startswith(prefix)]:
+            active, files, _ = self.dirs.pop(sub)
+            for name in files:
+                for idx in active:
+                    removed.append((name.lower(), self.samples[idx], os.path.join(sub, name)))
@@ -0,0 +1,164 @@
+# thumbnail_cache.py
+# Persistent thumbnail cache shared by all Inspecto instances and worker processes.
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from io import BytesIO
+from pathlib import Path
+from thumbnails import DEFAULT_QUALITY, Thumbnail, load_thumbnail, to_buffer_mode
+
+APP_NAME = "Inspecto"
+CACHE_FILE = os.path.join(os.getenv("APPDATA") or str(Path.home()), APP_NAME, "thumbnail_cache.sqlite")
+# A 350 px PNG entry is about 170 KB: one 12k image run at four widths (see the live width change)
+DEFAULT_MAX_MB = 8 * 1024
+MAX_MB_ENV = "INSPECTO_CACHE_MB"  # overrides the cap, inherited by the worker processes
+TOUCH_INTERVAL = 60  # seconds between LRU timestamp updates of the same entry
+EVICT_CHECK_EVERY = 64  # puts between size checks
+
+
+def cache_key(path, max_width, quality=DEFAULT_QUALITY):
+    """Key changes whenever the file is replaced or the thumbnail settings differ."""
+    st = os.stat(path)
+    raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{max_width}|{quality}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def configured_max_bytes():
+    """Size cap of the cache: INSPECTO_CACHE_MB if set, else DEFAULT_MAX_MB."""
+    value = os.getenv(MAX_MB_ENV)
+    if value:
+        try:
+            return max(1, int(value)) * 1024 * 1024
+        except ValueError:
+            print(f"Ignoring {MAX_MB_ENV}={value!r}, expected a size in MB")
+    return DEFAULT_MAX_MB * 1024 * 1024
+
+
+class ThumbnailCache:
+    """
+    SQLite backed key -> PNG blob store with an LRU size cap.
+    WAL mode and a busy timeout make it safe to share between processes.
+    Entries stay lossless: the diff engine and the metrics score them.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes or configured_max_bytes()
+        self._lock = threading.Lock()
+        self._puts = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS thumbs ("
+            " key TEXT PRIMARY KEY, data BLOB NOT NULL,"
+            " nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS thumbs_last_used ON thumbs(last_used)")
+
+    def get(self, key):
+        """Return the cached PIL image or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT data, last_used FROM thumbs WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            data, last_used = row
+            now = time.time()
+            if now - last_used > TOUCH_INTERVAL:
+                self._conn.execute("UPDATE thumbs SET last_used=? WHERE key=?", (now, key))
+        from PIL import Image
+        img = Image.open(BytesIO(data))
+        img.load()
+        return img
+
+    def put(self, key, pil_img):
+        bio = BytesIO()
+        pil_img.save(bio, format="PNG", compress_level=1)
+        data = bio.getvalue()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbs(key, data, nbytes, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self._puts += 1
+            if self._puts % EVICT_CHECK_EVERY == 0:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 10% below the cap."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbs").fetchone()[0]
+            if total > self.max_bytes:
+                to_free = total - int(self.max_bytes * 0.9)
+                victims = []
+                for key, nbytes in self._conn.execute("SELECT key, nbytes FROM thumbs ORDER BY last_used"):
+                    victims.append((key,))
+                    to_free -= nbytes
+                    if to_free <= 0:
+                        break
+                self._conn.executemany("DELETE FROM thumbs WHERE key=?", victims)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM thumbs")
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_pid = None
+
+
+def get_cache():
+    """Per-process cache connection (sqlite connections must not cross fork)."""
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        try:
+            _cache = ThumbnailCache()
+        except Exception as e:
+            print(f"Thumbnail cache unavailable: {e}")
+            _cache = False
+        _cache_pid = os.getpid()
+    return _cache or None
+
+
+def load_cached_thumbnail(path, max_width, quality=DEFAULT_QUALITY):
+    """load_thumbnail() backed by the disk cache. Cache errors never fail the load."""
+    cache = get_cache()
+    key = None
+    if cache is not None:
+        try:
+            key = cache_key(path, max_width, quality)
+            img = cache.get(key)
+            if img is not None:
+                return img
+        except Exception as e:
+            print(f"Thumbnail cache read failed for {path}: {e}")
+
+    img = load_thumbnail(path, max_width, quality)
+    if img is not None:
+        # What gets displayed; PNG cannot store e.g. CMYK
+        img = to_buffer_mode(img)
+    if img is not None and key is not None:
+        try:
+            cache.put(key, img)
+        except Exception as e:
+            print(f"Thumbnail cache write failed for {path}: {e}")
+    return img
+
+
+def load_thumbnail_buffer(path, max_width, quality=DEFAULT_QUALITY):
+    """Worker entry point: cached thumbnail as a raw Thumbnail buffer, or None."""
+    img = load_cached_thumbnail(path, max_width, quality)
+    return Thumbnail.from_pil(img) if img is not None else None
@@ -0,0 +1,104 @@
+# thumbnails.py
+# Qt-free image decoding, safe to run inside worker processes.
+# PIL is imported on first use, the GUI shows its window without it.
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Decode quality / speed trade-off:
+#   best     - full decode, LANCZOS resample (previous behaviour)
+#   balanced - JPEG DCT scaling to >= 2x target, LANCZOS with reduce() pre-step
+#   fast     - JPEG DCT scaling to >= 1x target, BILINEAR with reduce() pre-step
+DECODE_QUALITIES = ("best", "balanced", "fast")
+DEFAULT_QUALITY = "balanced"
+
+
+# Modes that map 1:1 onto a QImage format; everything else is converted
+BUFFER_MODES = ("RGB", "RGBA", "L")
+
+
+def to_buffer_mode(img):
+    """img converted to one of BUFFER_MODES (RGBA only if it has transparency)."""
+    if img.mode in BUFFER_MODES:
+        return img
+    has_alpha = img.mode in ("LA", "PA", "RGBa") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+
+class Thumbnail:
+    """
+    Decoded thumbnail as a raw pixel buffer.
+    Cheap to pickle between processes and wrapped by PIL/Qt without copies.
+    """
+    __slots__ = ("width", "height", "mode", "data")
+
+    def __init__(self, width, height, mode, data):
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.data = data
+
+    @classmethod
+    def from_pil(cls, img):
+        img = to_buffer_mode(img)
+        return cls(img.width, img.height, img.mode, img.tobytes())
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def bytes_per_line(self):
+        return self.width * len(self.mode)
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    def to_pil(self):
+        """Read-only PIL image sharing this buffer."""
+        from PIL import Image
+        return Image.frombuffer(self.mode, self.size, self.data, "raw", self.mode, 0, 1)
+
+
+def is_image_file(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def resize_to_width(img, max_width, quality=DEFAULT_QUALITY):
+    """
+    Resize an opened (not yet loaded) image to max_width keeping aspect ratio.
+    For JPEG, draft() lets libjpeg decode at 1/2, 1/4 or 1/8 scale, so most of
+    the pixels are never decoded. For other formats reducing_gap makes resize()
+    use a cheap integer reduce() before the final resample.
+    """
+    from PIL import Image
+    wpercent = (max_width / float(img.size[0]))
+    height = max(1, int((float(img.size[1]) * float(wpercent))))
+    if quality == "best":
+        return img.resize((max_width, height), Image.LANCZOS)
+
+    headroom = 2 if quality == "balanced" else 1
+    if img.format == "JPEG":
+        img.draft(img.mode, (max_width * headroom, height * headroom))
+    if quality == "balanced":
+        return img.resize((max_width, height), Image.LANCZOS, reducing_gap=3.0)
+    return img.resize((max_width, height), Image.BILINEAR, reducing_gap=2.0)
+
+
+def fit_to_box(img, box_width, box_height, quality=DEFAULT_QUALITY):
+    """Resize an opened image to fit inside box_width x box_height, never enlarging it."""
+    scale = min(box_width / img.size[0], box_height / img.size[1])
+    if scale >= 1:
+        return img
+    return resize_to_width(img, max(1, round(img.size[0] * scale)), quality)
+
+
+def load_thumbnail(path, max_width, quality=DEFAULT_QUALITY):
+    """Open image and resize it to max_width while keeping aspect ratio."""
+    from PIL import Image
+    try:
+        img = Image.open(path)
+        return resize_to_width(img, max_width, quality)
+    except Exception as e:
+        print(f"Error loading image {path}: {e}")
+        return None
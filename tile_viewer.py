@@ -0,0 +1,706 @@
+# tile_viewer.py
+# In-app full resolution viewers: originals are decoded into tile pyramids by
+# a shared background TileCache, and only the visible tiles are drawn.
+import math
+import os
+import threading
+from collections import OrderedDict
+from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QHBoxLayout, QGridLayout, QPushButton
+from PyQt6.QtCore import Qt, QObject, QTimer, QPointF, QRectF, pyqtSignal
+from PyQt6.QtGui import QColor, QKeySequence, QPainter, QShortcut
+from qt_images import qimage_to_pixmap, thumbnail_to_qimage
+from thumbnails import Thumbnail, to_buffer_mode
+
+TILE_SIZE = 512  # px of a tile at its own level
+TILE_BYTES = TILE_SIZE * TILE_SIZE * 4  # largest tile (RGBA)
+LEVEL_SCREENS = 4  # decoded tiles kept per level and view, in screens of that view at 100%
+CACHE_LEVELS = 4  # shares per view: drawn level, prefetched level and the coarser ones
+PIXMAP_SCREENS = 8  # tiles converted for drawing, per view
+DECODE_MB = 512  # levels decoded at the same time; a single level always decodes
+PREFETCH_FILL = 0.75  # prefetching only uses the cache below this fill level
+TILE_THREADS = max(1, min(4, os.cpu_count() or 1))  # PIL decodes without holding the GIL
+MAX_ZOOM = 32.0  # screen px per image px
+ZOOM_STEP = 1.25  # per wheel notch / key press
+SETTLE_MS = 150  # smooth redraw after the last zoom or pan step
+BACKGROUND = QColor("#202020")
+
+
+def level_size(width, height, level):
+    """Size of a pyramid level: the original divided by 2**level, rounded up like Image.reduce()."""
+    scale = 1 << level
+    return -(-width // scale), -(-height // scale)
+
+
+def max_level(width, height):
+    """Coarsest level, the first one that fits in a single tile."""
+    level = 0
+    while max(level_size(width, height, level)) > TILE_SIZE:
+        level += 1
+    return level
+
+
+def decode_level(path, level):
+    """
+    Decode path at pyramid level (or finer) as an RGB/RGBA/L image; returns
+    (image, its level). JPEG uses DCT scaling so coarse levels never decode
+    every pixel; other formats have no reduced decode and come back at level 0.
+    """
+    from PIL import Image
+    img = Image.open(path)
+    width, height = img.size
+    if img.format != "JPEG":
+        level = 0
+    size = level_size(width, height, level)
+    if level:
+        img.draft(img.mode, size)
+    img = to_buffer_mode(img)
+    if img.size != size:
+        img = img.resize(size, Image.BOX)
+    return img, level
+
+
+def decode_bytes(path, level):
+    """Memory decode_level(path, level) needs, from the header only."""
+    from PIL import Image
+    with Image.open(path) as img:
+        width, height = img.size
+        if img.format != "JPEG":
+            level = 0
+    width, height = level_size(width, height, level)
+    return width * height * 4
+
+
+class TileCache(QObject):
+    """
+    Decoded tiles of any number of images, shared by all viewers, in an LRU
+    sized by what is on screen: every open view gets a share of
+    LEVEL_SCREENS times its tiles at 100% per level, and the cache holds
+    CACHE_LEVELS shares per view, so closing viewers frees their tiles.
+    Images are identified by (path, mtime_ns), so a file replaced on disk is
+    decoded again.
+
+    Views ask for the visible tiles they are missing (and the next finer
+    level as prefetch) with request(). Worker threads decode a whole level
+    at a time, because PNG and JPEG cannot be decoded per tile, keep the
+    requested tiles plus the ones closest to the view's center up to its
+    share, and cut every coarser level from the same decode with a share
+    of its own. Levels being decoded at once stay within DECODE_MB.
+    Prefetching only fills the cache up to PREFETCH_FILL, so it never
+    pushes out tiles that are on screen.
+    """
+    level_ready = pyqtSignal(object, int)  # source, level
+
+    def __init__(self, threads=TILE_THREADS, decode_mb=DECODE_MB):
+        super().__init__()
+        self.max_bytes = 0
+        self.max_pixmap_bytes = 0
+        self.max_decode_bytes = decode_mb * 1024 * 1024
+        self.threads = threads
+        self._tiles = OrderedDict()  # (source, level, column, row) -> Thumbnail, LRU order
+        self._bytes = 0
+        self._pixmaps = OrderedDict()  # same keys -> QPixmap (GUI thread only)
+        self._pixmap_bytes = 0
+        self._wants = {}  # view -> (source, center, needed, prefetch), both [(level, tiles)]
+        self._screens = {}  # open view -> bytes of its tiles at 100%
+        self._running = set()  # (source, level) being decoded
+        self._cut_for = {}  # (source, level) -> tiles it was last cut for
+        self._failed = set()  # sources that could not be decoded
+        self._decoding = 0  # bytes of the levels being decoded
+        self._workers = []
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    # --- GUI side ---
+    def has(self, key):
+        with self._cond:
+            return key in self._tiles
+
+    def pixmap(self, key):
+        """QPixmap of tile key (source, level, column, row), None if it is not decoded yet."""
+        pixmap = self._pixmaps.get(key)
+        with self._cond:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)  # on screen: keep the tile too
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        if tile is None:
+            return None
+        pixmap = qimage_to_pixmap(thumbnail_to_qimage(tile))
+        if pixmap is None:
+            return None
+        self._pixmaps[key] = pixmap
+        self._pixmap_bytes += pixmap.width() * pixmap.height() * 4
+        self._trim_pixmaps()
+        return pixmap
+
+    def request(self, view, source, center, screen_tiles, needed, prefetch=()):
+        """
+        Tiles of source that view is missing as (level, tiles) pairs, most
+        important first, and pairs to prefetch when idle. center (x, y) in
+        0..1 image coordinates picks the tiles kept around the requested
+        ones, screen_tiles (tiles covering the view at 100%) sizes its share.
+        A level just cut for the same tiles is not decoded again: they were
+        evicted since, and decoding them again would only evict others.
+        Replaces the previous request of view.
+        """
+        with self._cond:
+            self._screens[view] = screen_tiles * TILE_BYTES
+            self._resize()
+            needed = [(level, tiles) for level, tiles in needed if self._cut_for.get((source, level)) != set(tiles)]
+            prefetch = [(level, tiles) for level, tiles in prefetch if self._cut_for.get((source, level)) != set(tiles)]
+            if (needed or prefetch) and source not in self._failed:
+                self._wants[view] = (source, center, needed, prefetch)
+                self._start_workers()
+                self._cond.notify_all()
+            else:
+                self._wants.pop(view, None)
+        self._trim_pixmaps()
+
+    def forget(self, view):
+        """Drop view's request and its share of the cache."""
+        with self._cond:
+            self._wants.pop(view, None)
+            self._screens.pop(view, None)
+            if not self._screens:
+                self._cut_for.clear()
+            self._resize()
+        self._trim_pixmaps()
+
+    def stop(self):
+        """Stop the worker threads; levels being decoded are finished first."""
+        with self._cond:
+            self._stopped = True
+            self._wants.clear()
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def _resize(self):
+        # Called with the lock held
+        screens = sum(self._screens.values())
+        self.max_bytes = screens * LEVEL_SCREENS * CACHE_LEVELS
+        self.max_pixmap_bytes = screens * PIXMAP_SCREENS
+        self._trim()
+
+    def _trim_pixmaps(self):
+        while self._pixmap_bytes > self.max_pixmap_bytes and self._pixmaps:
+            _, old = self._pixmaps.popitem(last=False)
+            self._pixmap_bytes -= old.width() * old.height() * 4
+
+    # --- Worker side ---
+    def _start_workers(self):
+        if self._workers or self._stopped:
+            return
+        for _ in range(self.threads):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_job(self):
+        """(source, level, tiles, center, share) of the most urgent request, prefetches only into free budget."""
+        for prefetching in (False, True):
+            if prefetching and self._bytes >= self.max_bytes * PREFETCH_FILL:
+                return None
+            for view, (source, center, needed, prefetch) in self._wants.items():
+                for level, tiles in (prefetch if prefetching else needed):
+                    if (source, level) not in self._running:
+                        return source, level, tiles, center, self._screens[view] * LEVEL_SCREENS
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None and not self._stopped:
+                    self._cond.wait()
+                    job = self._next_job()
+                if self._stopped:
+                    return
+                source, level, tiles, center, share = job
+                self._running.add((source, level))
+            try:
+                self._cut(source, level, tiles, center, share)
+                with self._cond:
+                    self._cut_for[(source, level)] = set(tiles)
+            except Exception as e:
+                print(f"Unable to decode {source[0]}: {e}")
+                with self._cond:
+                    self._failed.add(source)
+            finally:
+                with self._cond:
+                    self._running.discard((source, level))
+                    # Views ask again on their next paint if tiles are still missing
+                    for view, (s, c, needed, prefetch) in list(self._wants.items()):
+                        if s != source:
+                            continue
+                        if source in self._failed:
+                            del self._wants[view]
+                            continue
+                        needed = [(lv, t) for lv, t in needed if lv != level]
+                        prefetch = [(lv, t) for lv, t in prefetch if lv != level]
+                        if needed or prefetch:
+                            self._wants[view] = (s, c, needed, prefetch)
+                        else:
+                            del self._wants[view]
+            self.level_ready.emit(source, level)
+
+    def _cut(self, source, level, tiles, center, share):
+        """
+        Decode source at level and store tiles, then the ones closest to
+        center up to share; every coarser level is cut the same way, starting
+        with the tiles under tiles, with a share of its own.
+        """
+        nbytes = decode_bytes(source[0], level)
+        with self._cond:
+            # One level always decodes, more only while they fit in max_decode_bytes
+            while self._decoding and self._decoding + nbytes > self.max_decode_bytes and not self._stopped:
+                self._cond.wait()
+            self._decoding += nbytes
+        try:
+            img, source_level = decode_level(source[0], level)
+            if source_level < level:
+                img = img.reduce(1 << (level - source_level))
+            wanted = set(tiles)
+            while True:
+                cols = -(-img.width // TILE_SIZE)
+                rows = -(-img.height // TILE_SIZE)
+                cx, cy = center[0] * img.width / TILE_SIZE, center[1] * img.height / TILE_SIZE
+                coords = sorted(((c, r) for c in range(cols) for r in range(rows)),
+                                key=lambda t: (t not in wanted, (t[0] + 0.5 - cx) ** 2 + (t[1] + 0.5 - cy) ** 2))
+                budget = share
+                for tx, ty in coords:
+                    x, y = tx * TILE_SIZE, ty * TILE_SIZE
+                    box = (x, y, min(x + TILE_SIZE, img.width), min(y + TILE_SIZE, img.height))
+                    size = (box[2] - x) * (box[3] - y) * len(img.mode)
+                    if size > budget and (tx, ty) not in wanted:
+                        break
+                    budget -= size
+                    self._put((source, level, tx, ty), Thumbnail.from_pil(img.crop(box)))
+                if cols == 1 and rows == 1:
+                    return
+                img = img.reduce(2)
+                level += 1
+                wanted = {(tx >> 1, ty >> 1) for tx, ty in wanted}
+        finally:
+            with self._cond:
+                self._decoding -= nbytes
+                self._cond.notify_all()
+
+    def _put(self, key, tile):
+        with self._cond:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._tiles[key] = tile
+            self._bytes += tile.nbytes
+            self._trim()
+
+    def _trim(self):
+        # Called with the lock held
+        while self._bytes > self.max_bytes and self._tiles:
+            _, old = self._tiles.popitem(last=False)
+            self._bytes -= old.nbytes
+
+
+class TileView(QWidget):
+    """
+    Zoom (wheel, +/-), pan (drag) and fit (0, double click toggles 100%) over
+    one image. Each frame draws only the tiles of the level matching the
+    zoom that intersect the window; tiles still being decoded are drawn from
+    a coarser cached tile, so panning never waits for the decoder.
+    """
+    view_changed = pyqtSignal()  # zoomed or panned by the user
+
+    def __init__(self, path, cache, parent=None):
+        super().__init__(parent)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.path = path
+        self.cache = cache
+        self.error = None
+        self.image_size = None
+        from PIL import Image
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+            with Image.open(path) as img:
+                self.image_size = img.size  # header only
+        except Exception as e:
+            self.error = str(e)
+        self.source = (path, mtime_ns) if self.image_size else None
+        self.levels = max_level(*self.image_size) if self.image_size else 0
+        self.zoom = 1.0
+        self.origin = QPointF(0, 0)  # image coordinates at the top left corner of the widget
+        self._fit = True
+        self._closed = False
+        self._drag_from = None
+        self._interacting = False
+        self._settle = QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.setInterval(SETTLE_MS)
+        self._settle.timeout.connect(self._settled)
+        cache.level_ready.connect(self._level_ready)
+
+    def close_tiles(self):
+        """Stop asking the cache for tiles; call before the view goes away."""
+        self._closed = True
+        self.cache.forget(self)
+
+    # --- Geometry ---
+    def fit_zoom(self):
+        w, h = self.image_size
+        return min(max(1, self.width()) / w, max(1, self.height()) / h, 1.0)
+
+    def level_for_zoom(self):
+        """Finest level that still has at least one level pixel per screen pixel."""
+        if self.zoom >= 1:
+            return 0
+        return min(int(math.floor(math.log2(1 / self.zoom))), self.levels)
+
+    def _tile_rect(self, level, tx, ty):
+        """Widget rectangle of a tile."""
+        w, h = self.image_size
+        lw, lh = level_size(w, h, level)
+        sx, sy = w / lw, h / lh
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        x1, y1 = min(x0 + TILE_SIZE, lw), min(y0 + TILE_SIZE, lh)
+        return QRectF((x0 * sx - self.origin.x()) * self.zoom, (y0 * sy - self.origin.y()) * self.zoom,
+                      (x1 - x0) * sx * self.zoom, (y1 - y0) * sy * self.zoom)
+
+    def _visible_tiles(self, level):
+        """(column, row) of the tiles intersecting the widget, center first."""
+        w, h = self.image_size
+        lw, lh = level_size(w, h, level)
+        sx, sy = lw / w, lh / h
+        left = max(0.0, self.origin.x()) * sx
+        top = max(0.0, self.origin.y()) * sy
+        right = min(float(w), self.origin.x() + self.width() / self.zoom) * sx
+        bottom = min(float(h), self.origin.y() + self.height() / self.zoom) * sy
+        cols = range(int(left // TILE_SIZE), min(int(math.ceil(right / TILE_SIZE)), -(-lw // TILE_SIZE)))
+        rows = range(int(top // TILE_SIZE), min(int(math.ceil(bottom / TILE_SIZE)), -(-lh // TILE_SIZE)))
+        cx, cy = (left + right) / 2 / TILE_SIZE, (top + bottom) / 2 / TILE_SIZE
+        return sorted(((c, r) for c in cols for r in rows), key=lambda t: (t[0] + 0.5 - cx) ** 2 + (t[1] + 0.5 - cy) ** 2)
+
+    def screen_tiles(self):
+        """Tiles a window of this size covers at 100%, what the cache sizes this view's share by."""
+        return (-(-self.width() // TILE_SIZE) + 1) * (-(-self.height() // TILE_SIZE) + 1)
+
+    def _center(self):
+        """Image point in the middle of the widget, in 0..1 coordinates."""
+        w, h = self.image_size
+        x = (self.origin.x() + self.width() / self.zoom / 2) / w
+        y = (self.origin.y() + self.height() / self.zoom / 2) / h
+        return min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)
+
+    def _clamp(self):
+        """Center the image on axes where it is smaller than the window, else keep it covering the window."""
+        w, h = self.image_size
+        vw, vh = self.width() / self.zoom, self.height() / self.zoom
+        x = (w - vw) / 2 if vw >= w else min(max(self.origin.x(), 0.0), w - vw)
+        y = (h - vh) / 2 if vh >= h else min(max(self.origin.y(), 0.0), h - vh)
+        self.origin = QPointF(x, y)
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zoom keeping the image point under anchor (widget coordinates, default: center) in place."""
+        if self.image_size is None:
+            return
+        zoom = min(max(zoom, self.fit_zoom() / 4), MAX_ZOOM)
+        if anchor is None:
+            anchor = QPointF(self.width() / 2, self.height() / 2)
+        image_point = self.origin + anchor / self.zoom
+        self.zoom = zoom
+        self.origin = image_point - anchor / self.zoom
+        self._fit = False
+        self._clamp()
+        self._interact()
+        self.view_changed.emit()
+
+    def fit(self):
+        if self.image_size is None:
+            return
+        self._apply_fit()
+        self.view_changed.emit()
+
+    def _apply_fit(self):
+        self.zoom = self.fit_zoom()
+        self._fit = True
+        self._clamp()
+        self.update()
+
+    def normalized_view(self):
+        """(zoom, x, y, fit) relative to the image width, so images of other sizes can follow."""
+        if self.image_size is None:
+            return None
+        w = self.image_size[0]
+        return self.zoom * w, self.origin.x() / w, self.origin.y() / w, self._fit
+
+    def set_normalized_view(self, state):
+        """Follow another view's normalized_view() without emitting view_changed."""
+        if self.image_size is None or state is None:
+            return
+        zoom, x, y, fit = state
+        if fit:
+            self._apply_fit()
+            return
+        w = self.image_size[0]
+        self.zoom = zoom / w
+        self.origin = QPointF(x * w, y * w)
+        self._fit = False
+        self._clamp()
+        self._interact()
+
+    def _interact(self):
+        # Fast (unsmoothed) frames while zooming or panning, one smooth frame when it stops
+        self._interacting = True
+        self._settle.start()
+        self.update()
+
+    def _settled(self):
+        self._interacting = False
+        self.update()
+
+    # --- Tiles ---
+    def _level_ready(self, source, level):
+        if source == self.source:
+            self.update()
+
+    def _draw_fallback(self, painter, level, tx, ty):
+        """Draw the part of the nearest coarser cached tile that covers (level, tx, ty)."""
+        for coarse in range(level + 1, self.levels + 1):
+            shift = coarse - level
+            cx, cy = tx >> shift, ty >> shift
+            pixmap = self.cache.pixmap((self.source, coarse, cx, cy))
+            if pixmap is None:
+                continue
+            size = TILE_SIZE >> shift
+            source = QRectF((tx - (cx << shift)) * size, (ty - (cy << shift)) * size, size, size)
+            painter.drawPixmap(self._tile_rect(level, tx, ty), pixmap, source.intersected(QRectF(pixmap.rect())))
+            return
+
+    # --- Events ---
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), BACKGROUND)
+        if self.image_size is None:
+            painter.setPen(QColor("white"))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, f"Unable to open image:\n{self.error}")
+            return
+        if self._closed:
+            return
+        level = self.level_for_zoom()
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, self.zoom < 1 and not self._interacting)
+        missing = False
+        visible = self._visible_tiles(level)
+        for tx, ty in visible:
+            pixmap = self.cache.pixmap((self.source, level, tx, ty))
+            if pixmap is None:
+                missing = True
+                self._draw_fallback(painter, level, tx, ty)
+                continue
+            painter.drawPixmap(self._tile_rect(level, tx, ty), pixmap, QRectF(pixmap.rect()))
+        painter.end()
+
+        # The coarsest tile backs every fallback, so it comes first
+        needed = []
+        if not self.cache.has((self.source, self.levels, 0, 0)):
+            needed.append((self.levels, [(0, 0)]))
+        if missing and level != self.levels:
+            needed.append((level, visible))
+        # One level finer around the center, so zooming in finds it decoded
+        prefetch = []
+        if level > 0:
+            finer = self._visible_tiles(level - 1)
+            if any(not self.cache.has((self.source, level - 1) + t) for t in finer):
+                prefetch.append((level - 1, finer))
+        self.cache.request(self, self.source, self._center(), self.screen_tiles(), needed, prefetch)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.image_size is None:
+            return
+        if self._fit:
+            self._apply_fit()
+        else:
+            self._clamp()
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.set_zoom(self.zoom * ZOOM_STEP ** steps, event.position())
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self._drag_from = event.position()
+            self.setCursor(Qt.CursorShape.ClosedHandCursor)
+
+    def mouseMoveEvent(self, event):
+        if self._drag_from is None or self.image_size is None:
+            return
+        delta = event.position() - self._drag_from
+        self._drag_from = event.position()
+        self.origin -= delta / self.zoom
+        self._clamp()
+        self._interact()
+        self.view_changed.emit()
+
+    def mouseReleaseEvent(self, event):
+        self._drag_from = None
+        self.unsetCursor()
+
+    def mouseDoubleClickEvent(self, event):
+        if self._fit:
+            self.set_zoom(1.0, event.position())
+        else:
+            self.fit()
+
+    def keyPressEvent(self, event):
+        key = event.key()
+        if key in (Qt.Key.Key_Plus, Qt.Key.Key_Equal):
+            self.set_zoom(self.zoom * ZOOM_STEP)
+        elif key == Qt.Key.Key_Minus:
+            self.set_zoom(self.zoom / ZOOM_STEP)
+        elif key == Qt.Key.Key_0:
+            self.fit()
+        elif key == Qt.Key.Key_1:
+            self.set_zoom(1.0)
+        else:
+            super().keyPressEvent(event)
+
+
+class TileViewer(QWidget):
+    """Viewer window for one image."""
+
+    def __init__(self, path, cache, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setWindowTitle(os.path.basename(path))
+        self.resize(1200, 800)
+        self.view = TileView(path, cache, self)
+        self.info_label = QLabel(self)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+        layout.addWidget(self.view, 1)
+        layout.addWidget(self.info_label)
+        self.view.view_changed.connect(self.update_info)
+        self.update_info()
+        self.view.setFocus()
+
+    def update_info(self):
+        if self.view.image_size is None:
+            self.info_label.setText(self.view.path)
+            return
+        w, h = self.view.image_size
+        self.info_label.setText(f"{self.view.path}   {w} x {h}   {self.view.zoom * 100:.0f}%   "
+                                f"(wheel: zoom, drag: pan, 0: fit, 1: 100%, double click: toggle)")
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key.Key_Escape:
+            self.close()
+        else:
+            super().keyPressEvent(event)
+
+    def closeEvent(self, event):
+        self.view.close_tiles()
+        super().closeEvent(event)
+
+
+class CompareViewer(QWidget):
+    """
+    Every sample of a tag in a grid of linked TileViews: zooming or panning
+    one moves all of them, in coordinates relative to the image width.
+    Previous/Next (Page Up/Down) step through the tags of the store and keep
+    the zoom and position.
+    """
+
+    def __init__(self, store, tag, cache, parent=None):
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.resize(1400, 900)
+        self.store = store
+        self.cache = cache
+        self.tags = store.tags()
+        self.tag = tag
+        self.views = []
+
+        self.prev_button = QPushButton("< Previous")
+        self.prev_button.clicked.connect(lambda: self.step(-1))
+        self.next_button = QPushButton("Next >")
+        self.next_button.clicked.connect(lambda: self.step(1))
+        self.tag_label = QLabel()
+        self.tag_label.setStyleSheet("font-weight: bold; font-size: 16px;")
+        QShortcut(QKeySequence(Qt.Key.Key_PageUp), self, lambda: self.step(-1))
+        QShortcut(QKeySequence(Qt.Key.Key_PageDown), self, lambda: self.step(1))
+        QShortcut(QKeySequence(Qt.Key.Key_Escape), self, self.close)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.prev_button)
+        controls.addWidget(self.tag_label, 1, Qt.AlignmentFlag.AlignCenter)
+        controls.addWidget(self.next_button)
+        self.grid = QGridLayout()
+        self.grid.setSpacing(4)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addLayout(controls)
+        layout.addLayout(self.grid, 1)
+        self.show_tag(tag)
+
+    def step(self, delta):
+        if self.tag not in self.tags:
+            return
+        index = self.tags.index(self.tag) + delta
+        if 0 <= index < len(self.tags):
+            self.show_tag(self.tags[index])
+
+    def show_tag(self, tag):
+        state = self.views[0].normalized_view() if self.views else None
+        for view in self.views:
+            view.close_tiles()
+        while self.grid.count():
+            widget = self.grid.takeAt(0).widget()
+            if widget is not None:
+                widget.deleteLater()
+        self.views = []
+
+        self.tag = tag
+        samples = [s for s in self.store.samples if self.store.path(tag, s)]
+        columns = max(1, math.ceil(math.sqrt(len(samples))))
+        for i, sample in enumerate(samples):
+            cell = QWidget()
+            cell_layout = QVBoxLayout(cell)
+            cell_layout.setContentsMargins(0, 0, 0, 0)
+            cell_layout.setSpacing(0)
+            label = QLabel(sample)
+            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            view = TileView(self.store.path(tag, sample), self.cache, cell)
+            view.view_changed.connect(self.sync_views)
+            cell_layout.addWidget(label)
+            cell_layout.addWidget(view, 1)
+            self.grid.addWidget(cell, i // columns, i % columns)
+            self.views.append(view)
+        for r in range(self.grid.rowCount()):
+            self.grid.setRowStretch(r, 1)
+        for c in range(self.grid.columnCount()):
+            self.grid.setColumnStretch(c, 1)
+
+        position = self.tags.index(tag) + 1 if tag in self.tags else 0
+        self.tag_label.setText(f"{tag}   ({position}/{len(self.tags)}, {len(samples)} samples)")
+        self.setWindowTitle(f"Compare {tag}")
+        self.prev_button.setEnabled(position > 1)
+        self.next_button.setEnabled(0 < position < len(self.tags))
+        if state is not None:
+            # The new views only know their size once laid out
+            QTimer.singleShot(0, lambda: [view.set_normalized_view(state) for view in self.views])
+
+    def sync_views(self):
+        source = self.sender()
+        state = source.normalized_view()
+        for view in self.views:
+            if view is not source:
+                view.set_normalized_view(state)
+
+    def closeEvent(self, event):
+        for view in self.views:
+            view.close_tiles()
+        super().closeEvent(event)
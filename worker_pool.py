@@ -0,0 +1,120 @@
+# worker_pool.py
+# Shared process pool for CPU heavy work (decoding, resizing).
+# PIL holds the GIL for most of the resize work, so threads do not scale.
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+
+_lock = threading.RLock()
+_pool = None
+_pool_workers = 0
+_users = {}  # pool -> number of ordered_map() calls still submitting to it
+
+
+def default_workers():
+    """Leave one core for the GUI."""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def get_process_pool(workers=None):
+    """
+    Return the shared pool, creating a new one when the worker count changes.
+    A replaced pool is shut down once the last ordered_map() using it is done.
+    """
+    global _pool, _pool_workers
+    workers = workers or default_workers()
+    with _lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None and not _users.get(_pool):
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def _acquire_pool(workers):
+    with _lock:
+        pool = get_process_pool(workers)
+        _users[pool] = _users.get(pool, 0) + 1
+        return pool
+
+
+def _release_pool(pool):
+    with _lock:
+        if pool not in _users:  # shutdown_pools() ran meanwhile
+            return
+        _users[pool] -= 1
+        if _users[pool]:
+            return
+        del _users[pool]
+        if pool is not _pool:
+            pool.shutdown(wait=False)
+
+
+def shutdown_pools():
+    global _pool, _pool_workers
+    with _lock:
+        for pool in set(_users) | ({_pool} if _pool is not None else set()):
+            pool.shutdown(wait=False, cancel_futures=True)
+        _users.clear()
+        _pool = None
+        _pool_workers = 0
+
+
+class Cancelled(Exception):
+    """Raised by ordered_map() when should_stop() turned true."""
+
+
+POLL_INTERVAL = 0.05  # seconds between should_stop() checks while waiting
+
+
+def ordered_map(func, jobs, workers=None, window=None, should_stop=None):
+    """
+    Like map(func, *job) but runs in the process pool.
+    Results are yielded in job order, with at most `window` jobs in flight
+    so memory stays bounded. workers <= 1 runs in the calling thread.
+
+    should_stop is polled while waiting; when it returns True the queued
+    jobs are cancelled and Cancelled is raised. Jobs already running in a
+    worker finish in the background and their results are dropped, so
+    the latency is bounded by POLL_INTERVAL, not by the job duration
+    (in-thread mode: by one job).
+    """
+    workers = workers or default_workers()
+    if workers <= 1:
+        for job in jobs:
+            if should_stop and should_stop():
+                raise Cancelled()
+            yield func(*job)
+        return
+
+    # Held until the generator is done, so a worker count change made
+    # meanwhile does not shut this pool down under us
+    pool = _acquire_pool(workers)
+    window = window or workers * 4
+    pending = deque()
+
+    def next_result():
+        future = pending.popleft()
+        while True:
+            if should_stop and should_stop():
+                future.cancel()
+                raise Cancelled()
+            try:
+                return future.result(timeout=POLL_INTERVAL if should_stop else None)
+            except FuturesTimeout:
+                continue
+
+    try:
+        for job in jobs:
+            pending.append(pool.submit(func, *job))
+            if len(pending) >= window:
+                yield next_result()
+        while pending:
+            yield next_result()
+    finally:
+        # Cancelled, failed or abandoned by the caller: drop queued jobs
+        for future in pending:
+            future.cancel()
+        _release_pool(pool)